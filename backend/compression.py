@@ -0,0 +1,200 @@
+"""
+Compression des réponses HTTP (brotli, gzip) selon l'en-tête Accept-Encoding.
+Les corps plus petits que minimum_size partent tels quels ; les réponses en flux
+(exports) sont compressées morceau par morceau, et les flux d'événements
+(text/event-stream) ne sont jamais compressés pour ne pas retarder leur envoi.
+Toute réponse compressible porte Vary: Accept-Encoding, et l'ETag d'une réponse
+compressée est suffixé par son encodage ("abc-gzip") : les caches ne confondent pas
+les représentations, et If-None-Match est ramené à l'ETag de l'application.
+"""
+
+import logging
+import zlib
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # dépendance optionnelle : gzip seul
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_ENCODINGS = ("br", "gzip")
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+
+class GzipEncoder:
+    def __init__(self, level: int):
+        # wbits 31 : format gzip (en-tête et CRC)
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        chunk = self.compressor.compress(data)
+        return chunk + self.compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class BrotliEncoder:
+    def __init__(self, quality: int):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        chunk = self.compressor.process(data)
+        return chunk + (self.compressor.finish() if final else self.compressor.flush())
+
+
+def accepted_encodings(header: str) -> set:
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+def etag_with_suffix(etag: bytes, encoding: str) -> bytes:
+    # Chaque encodage est une représentation distincte : ETag propre ("abc" -> "abc-br")
+    if etag.endswith(b'"'):
+        return etag[:-1] + b"-" + encoding.encode() + b'"'
+    return etag
+
+
+def strip_etag_suffix(scope, encoding: str) -> bool:
+    # If-None-Match reçu avec l'ETag suffixé : l'application compare l'ETag d'origine.
+    # Le scope est modifié sur place : une copie perdrait scope["route"], posé par le
+    # routeur et lu par les middlewares extérieurs (métriques)
+    suffix = b"-" + encoding.encode() + b'"'
+    headers = []
+    stripped = False
+    for name, value in scope["headers"]:
+        if name == b"if-none-match" and value.endswith(suffix):
+            value = value[:-len(suffix)] + b'"'
+            stripped = True
+        headers.append((name, value))
+    if stripped:
+        scope["headers"] = headers
+    return stripped
+
+
+def with_vary(headers) -> list:
+    # Ajoute Accept-Encoding à Vary (éventuellement déjà posé par CORS : Origin)
+    result = []
+    found = False
+    for name, value in headers:
+        if name == b"vary":
+            found = True
+            if b"accept-encoding" not in value.lower():
+                value = value + b", Accept-Encoding"
+        result.append((name, value))
+    if not found:
+        result.append((b"vary", b"Accept-Encoding"))
+    return result
+
+
+class CompressionMiddleware:
+    # Middleware ASGI : encodings dans l'ordre de préférence du serveur
+    def __init__(
+        self,
+        app,
+        encodings=SUPPORTED_ENCODINGS,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4
+    ):
+        self.app = app
+        self.encodings = [encoding for encoding in encodings if encoding in SUPPORTED_ENCODINGS]
+        if "br" in self.encodings and brotli is None:
+            logger.warning("Module brotli absent : compression gzip uniquement")
+            self.encodings.remove("br")
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def negotiate(self, scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accepted = accepted_encodings(value.decode("latin-1"))
+                return next((encoding for encoding in self.encodings if encoding in accepted), None)
+        return None
+
+    def encoder(self, encoding: str):
+        if encoding == "br":
+            return BrotliEncoder(self.brotli_quality)
+        return GzipEncoder(self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self.negotiate(scope)
+        revalidated = encoding is not None and strip_etag_suffix(scope, encoding)
+        start = None
+        encoder = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, encoder, passthrough
+            if message["type"] == "http.response.start":
+                # Retenu jusqu'au premier morceau du corps : sa taille décide
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                headers = dict(start["headers"])
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                if b"content-encoding" in headers or content_type.startswith(UNCOMPRESSED_TYPES):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                if encoding is None or (not more_body and len(body) < self.minimum_size):
+                    # Corps envoyé tel quel, mais qui aurait pu être compressé
+                    passthrough = True
+                    await send(uncompressed_start())
+                    await send(message)
+                    return
+                encoder = self.encoder(encoding)
+                response_headers = [
+                    (name, etag_with_suffix(value, encoding) if name == b"etag" else value)
+                    for name, value in with_vary(start["headers"]) if name != b"content-length"
+                ]
+                response_headers.append((b"content-encoding", encoding.encode()))
+                compressed = encoder.compress(body, final=not more_body)
+                if not more_body:
+                    response_headers.append((b"content-length", str(len(compressed)).encode()))
+                await send({**start, "headers": response_headers})
+                await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+                return
+
+            await send({
+                "type": "http.response.body",
+                "body": encoder.compress(body, final=not more_body),
+                "more_body": more_body,
+            })
+
+        def uncompressed_start():
+            # Un 304 porte l'ETag de la représentation compressée si c'est elle que
+            # le client a revalidée
+            headers = with_vary(start["headers"])
+            if revalidated and start["status"] == 304:
+                headers = [
+                    (name, etag_with_suffix(value, encoding) if name == b"etag" else value)
+                    for name, value in headers
+                ]
+            return {**start, "headers": headers}
+
+        await self.app(scope, receive, send_wrapper)
+        # Réponse sans message de corps : l'en-tête retenu part seul
+        if start is not None and encoder is None and not passthrough:
+            await send(uncompressed_start())
@@ -0,0 +1,150 @@
+"""
+File de tâches en arrière-plan du processus : les tâches longues (purge des
+transactions d'un ouvrier supprimé, recalcul des soldes) sont exécutées hors de
+la requête HTTP, à concurrence bornée. L'état de chaque tâche est conservé dans
+MongoDB et consultable sur /api/jobs/{id}.
+
+Chaque processus détient ses tâches par un bail (lease_until) qu'il renouvelle
+toutes les lease_seconds / 3 secondes. Les tâches dont le bail a expiré (processus
+arrêté ou mort) sont reprises par un autre processus, jamais celles d'un processus
+vivant.
+"""
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Champs internes au bail, jamais renvoyés aux clients
+INTERNAL_FIELDS = ("owner", "lease_until")
+
+
+class JobQueue:
+    def __init__(self, concurrency: int, lease_seconds: float = 60):
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.handlers = {}
+        self.queue: Optional[asyncio.Queue] = None
+        self.tasks = []
+        self.collection = None
+        self.owner = None
+
+    def handler(self, job_type: str):
+        # Décorateur : associe une coroutine (paramètres nommés -> résultat) à un type de tâche
+        def register(func):
+            self.handlers[job_type] = func
+            return func
+        return register
+
+    def lease_until(self) -> datetime:
+        return datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+
+    async def start(self, collection):
+        self.collection = collection
+        self.queue = asyncio.Queue()
+        self.owner = str(uuid.uuid4())
+        await self.claim_expired()
+        self.tasks = [asyncio.create_task(self.worker()) for _ in range(self.concurrency)]
+        self.tasks.append(asyncio.create_task(self.heartbeat()))
+
+    async def claim_expired(self) -> int:
+        # Tâches interrompues dont le bail a expiré (les handlers sont idempotents) ;
+        # avec plusieurs processus, un seul reprend chaque tâche (échange atomique
+        # du propriétaire, conditionné au bail expiré)
+        claimed = 0
+        expired = {"$or": [{"lease_until": {"$lt": datetime.utcnow()}}, {"lease_until": {"$exists": False}}]}
+        async for job in self.collection.find({"status": {"$in": [PENDING, RUNNING]}, **expired}, {"_id": 0}):
+            job = await self.collection.find_one_and_update(
+                {"id": job["id"], "owner": job.get("owner"), **expired},
+                {"$set": {"owner": self.owner, "lease_until": self.lease_until()}},
+                projection={"_id": 0}
+            )
+            if job:
+                logger.info("Reprise de la tâche %s (%s)", job["id"], job["type"])
+                self.queue.put_nowait(job)
+                claimed += 1
+        return claimed
+
+    async def heartbeat(self):
+        # Prolonge le bail des tâches du processus et reprend celles des processus morts
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self.collection.update_many(
+                    {"owner": self.owner, "status": {"$in": [PENDING, RUNNING]}},
+                    {"$set": {"lease_until": self.lease_until()}}
+                )
+                await self.claim_expired()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Renouvellement des baux de tâches impossible")
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        # Arrêt propre : bail rendu, les tâches interrompues sont reprises sans attendre
+        await self.collection.update_many(
+            {"owner": self.owner, "status": {"$in": [PENDING, RUNNING]}},
+            {"$set": {"lease_until": datetime.utcnow()}}
+        )
+
+    async def submit(self, job_type: str, **params) -> dict:
+        if job_type not in self.handlers:
+            raise ValueError(f"Type de tâche inconnu : {job_type}")
+        job = {
+            "id": str(uuid.uuid4()),
+            "type": job_type,
+            "params": params,
+            "status": PENDING,
+            "owner": self.owner,
+            "lease_until": self.lease_until(),
+            "created_at": datetime.utcnow(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        await self.collection.insert_one(dict(job))
+        self.queue.put_nowait(job)
+        return {field: value for field, value in job.items() if field not in INTERNAL_FIELDS}
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"id": job_id}, {"_id": 0, **{field: 0 for field in INTERNAL_FIELDS}})
+
+    async def update(self, job_id: str, **fields):
+        await self.collection.update_one({"id": job_id}, {"$set": fields})
+
+    async def worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                await self.run(job)
+            finally:
+                self.queue.task_done()
+
+    async def run(self, job: dict):
+        await self.update(job["id"], status=RUNNING, started_at=datetime.utcnow())
+        try:
+            result = await self.handlers[job["type"]](**job["params"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Échec de la tâche %s (%s)", job["id"], job["type"])
+            await self.update(job["id"], status=FAILED, finished_at=datetime.utcnow(), error=str(e))
+        else:
+            await self.update(job["id"], status=DONE, finished_at=datetime.utcnow(), result=result)
+
+    async def join(self):
+        # Attend la fin des tâches en file (arrêt propre, scripts d'administration)
+        await self.queue.join()
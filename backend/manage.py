@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Commandes d'administration de l'API de gestion des paies
+Usage : python manage.py <commande> [options]
+"""
+
+import argparse
+import asyncio
+import sys
+
+import server
+
+
+async def reconcile(args):
+    drifts = await server.reconcile_ledger(dry_run=args.dry_run)
+    for drift in drifts:
+        ledger, expected = drift["ledger"], drift["expected"]
+        print(
+            f"{drift['worker_id']}: "
+            f"dû {server.from_cents(ledger['due_cents'])} -> {server.from_cents(expected['due_cents'])}, "
+            f"payé {server.from_cents(ledger['paid_cents'])} -> {server.from_cents(expected['paid_cents'])}, "
+            f"transactions {ledger['transaction_count']} -> {expected['transaction_count']}"
+        )
+    action = "détecté(s)" if args.dry_run else "corrigé(s)"
+    print(f"{len(drifts)} écart(s) {action} dans worker_balances")
+    return 1 if drifts and args.dry_run else 0
+
+
+async def ensure_indexes(args):
+    # Comme au démarrage : transactions_archive est créée compressée avant ses index
+    await server.bootstrap_db()
+    for collection_name, indexes in server.INDEXES.items():
+        for index in indexes:
+            print(f"{collection_name}: {index.document['name']}")
+    return 0
+
+
+async def checkpoint(args):
+    created = await server.create_checkpoints()
+    print(f"{created} checkpoint(s) créé(s) (période : {server.CHECKPOINT_PERIOD})")
+    return 0
+
+
+async def index_search(args):
+    updated = await server.backfill_worker_search(rebuild=args.rebuild)
+    print(f"{updated} ouvrier(s) indexé(s) pour la recherche")
+    return 0
+
+
+async def migrate_cents(args):
+    result = await server.migrate_amounts_to_cents()
+    print(f"{result['converted']} transaction(s) convertie(s) en centimes, dont {result['rounded']} arrondie(s)")
+    print(f"{result['ledger_fixed']} solde(s) recalculé(s), {result['checkpoints']} checkpoint(s) recréé(s)")
+    return 0
+
+
+async def archive(args):
+    result = await server.archive_transactions()
+    print(f"{result['archived']} transaction(s) antérieure(s) au {result['archived_before']:%Y-%m-%d} archivée(s)")
+    return 0
+
+
+async def backfill_sync(args):
+    updated = await server.backfill_sync()
+    print(f"{updated} document(s) préparé(s) pour /api/sync")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Administration de l'API de gestion des paies")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    reconcile_parser = commands.add_parser(
+        "reconcile", help="reconstruit le ledger des soldes depuis les transactions"
+    )
+    reconcile_parser.add_argument(
+        "--dry-run", action="store_true", help="signale les écarts sans corriger le ledger"
+    )
+    reconcile_parser.set_defaults(handler=reconcile)
+
+    indexes_parser = commands.add_parser(
+        "ensure-indexes", help="crée les index MongoDB manquants"
+    )
+    indexes_parser.set_defaults(handler=ensure_indexes)
+
+    checkpoint_parser = commands.add_parser(
+        "checkpoint", help="crée les checkpoints de solde des périodes closes"
+    )
+    checkpoint_parser.set_defaults(handler=checkpoint)
+
+    search_parser = commands.add_parser(
+        "index-search", help="ajoute les clés de recherche aux ouvriers existants"
+    )
+    search_parser.add_argument(
+        "--rebuild", action="store_true", help="recalcule les clés de tous les ouvriers"
+    )
+    search_parser.set_defaults(handler=index_search)
+
+    cents_parser = commands.add_parser(
+        "migrate-cents", help="convertit les montants existants en centimes entiers"
+    )
+    cents_parser.set_defaults(handler=migrate_cents)
+
+    archive_parser = commands.add_parser(
+        "archive", help="déplace les transactions anciennes dans transactions_archive"
+    )
+    archive_parser.set_defaults(handler=archive)
+
+    sync_parser = commands.add_parser(
+        "backfill-sync", help="date les ouvriers et transactions existants pour /api/sync"
+    )
+    sync_parser.set_defaults(handler=backfill_sync)
+
+    return parser
+
+
+async def main(argv=None):
+    args = build_parser().parse_args(argv)
+    server.connect_db()
+    try:
+        return await args.handler(args)
+    except server.LedgerBusy as e:
+        # Réconciliation, checkpoints et archivage ne se chevauchent pas
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        server.close_db()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,367 @@
+"""
+Instrumentation des requêtes : latence, taille des réponses, requêtes en cours
+et appels MongoDB par route, exposés au format texte Prometheus ; occupation
+du pool de connexions MongoDB et délestage quand sa file d'attente déborde.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Optional
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+DB_CALL_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+
+class RequestStats:
+    # Appels MongoDB d'une requête HTTP ; partagé avec les threads de Motor
+    # via le contexte copié à chaque appel
+    def __init__(self):
+        self.db_calls = 0
+        self.db_seconds = 0.0
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class DbCommandMonitor(monitoring.CommandListener):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.commands = defaultdict(int)
+        self.failures = defaultdict(int)
+        self.seconds = defaultdict(float)
+
+    def record(self, event, failed: bool):
+        seconds = event.duration_micros / 1_000_000
+        with self.lock:
+            self.commands[event.command_name] += 1
+            self.seconds[event.command_name] += seconds
+            if failed:
+                self.failures[event.command_name] += 1
+        stats = current_request.get()
+        if stats is not None:
+            stats.db_calls += 1
+            stats.db_seconds += seconds
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.record(event, failed=False)
+
+    def failed(self, event):
+        self.record(event, failed=True)
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    # Occupation des pools de connexions du client (tous serveurs confondus)
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.open = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.wait_failures = 0
+
+    def add(self, field: str, delta: int):
+        with self.lock:
+            setattr(self, field, getattr(self, field) + delta)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "open": self.open,
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "wait_failures": self.wait_failures,
+            }
+
+    def connection_created(self, event):
+        self.add("open", 1)
+
+    def connection_closed(self, event):
+        self.add("open", -1)
+
+    def connection_check_out_started(self, event):
+        self.add("waiting", 1)
+
+    def connection_checked_out(self, event):
+        with self.lock:
+            self.waiting -= 1
+            self.in_use += 1
+
+    def connection_check_out_failed(self, event):
+        with self.lock:
+            self.waiting -= 1
+            self.wait_failures += 1
+
+    def connection_checked_in(self, event):
+        self.add("in_use", -1)
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # dernier compteur : +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in labels.items()) + "}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.in_flight = 0
+        self.requests = defaultdict(int)  # (method, route, status)
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))  # (method, route)
+        self.response_size = defaultdict(lambda: Histogram(SIZE_BUCKETS))  # (method, route)
+        self.db_calls = defaultdict(lambda: Histogram(DB_CALL_BUCKETS))  # (method, route)
+        self.db_seconds = defaultdict(float)  # (method, route)
+        self.slow_requests = 0
+        self.shed_requests = 0
+
+    def observe(self, method: str, route: str, status: int, seconds: float, size: int, stats: RequestStats):
+        key = (method, route)
+        self.requests[(method, route, status)] += 1
+        self.latency[key].observe(seconds)
+        self.response_size[key].observe(size)
+        self.db_calls[key].observe(stats.db_calls)
+        self.db_seconds[key] += stats.db_seconds
+
+    def render(self, db_monitor: DbCommandMonitor, gauges: Optional[dict] = None) -> str:
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def histogram(name: str, help_text: str, series: dict):
+            metric(name, "histogram", help_text)
+            for (method, route), hist in sorted(series.items()):
+                labels = {"method": method, "route": route}
+                cumulative = 0
+                for bound, count in zip(hist.buckets + ("+Inf",), hist.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{format_labels({**labels, 'le': bound})} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(labels)} {hist.total}")
+                lines.append(f"{name}_count{format_labels(labels)} {hist.count}")
+
+        metric("http_requests_in_flight", "gauge", "Requêtes HTTP en cours de traitement")
+        lines.append(f"http_requests_in_flight {self.in_flight}")
+
+        metric("http_requests_total", "counter", "Requêtes HTTP traitées")
+        for (method, route, status), count in sorted(self.requests.items()):
+            lines.append(f"http_requests_total{format_labels({'method': method, 'route': route, 'status': status})} {count}")
+
+        metric("http_slow_requests_total", "counter", "Requêtes au-delà du seuil de lenteur")
+        lines.append(f"http_slow_requests_total {self.slow_requests}")
+
+        metric("http_requests_shed_total", "counter", "Requêtes refusées par délestage (503)")
+        lines.append(f"http_requests_shed_total {self.shed_requests}")
+
+        histogram("http_request_duration_seconds", "Latence des requêtes HTTP", self.latency)
+        histogram("http_response_size_bytes", "Taille des corps de réponse", self.response_size)
+        histogram("http_request_db_calls", "Commandes MongoDB par requête HTTP", self.db_calls)
+
+        metric("http_request_db_seconds_total", "counter", "Temps passé dans MongoDB par route")
+        for (method, route), seconds in sorted(self.db_seconds.items()):
+            lines.append(f"http_request_db_seconds_total{format_labels({'method': method, 'route': route})} {seconds}")
+
+        with db_monitor.lock:
+            commands = sorted(db_monitor.commands.items())
+            failures = dict(db_monitor.failures)
+            seconds = dict(db_monitor.seconds)
+        metric("mongodb_commands_total", "counter", "Commandes MongoDB exécutées")
+        for command, count in commands:
+            lines.append(f"mongodb_commands_total{format_labels({'command': command})} {count}")
+        metric("mongodb_command_failures_total", "counter", "Commandes MongoDB en échec")
+        for command, _ in commands:
+            lines.append(f"mongodb_command_failures_total{format_labels({'command': command})} {failures.get(command, 0)}")
+        metric("mongodb_command_seconds_total", "counter", "Durée cumulée des commandes MongoDB")
+        for command, _ in commands:
+            lines.append(f"mongodb_command_seconds_total{format_labels({'command': command})} {seconds[command]}")
+
+        for name, (kind, help_text, value) in sorted((gauges or {}).items()):
+            metric(name, kind, help_text)
+            lines.append(f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    # Middleware ASGI : mesure la requête jusqu'au dernier octet envoyé, y compris
+    # pour les réponses en flux (exports)
+    def __init__(self, app, registry: MetricsRegistry, slow_request_seconds: Optional[float] = None):
+        self.app = app
+        self.registry = registry
+        self.slow_request_seconds = slow_request_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        self.registry.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            seconds = time.perf_counter() - start
+            self.registry.in_flight -= 1
+            current_request.reset(token)
+            route = scope.get("route")
+            route_path = route.path if route is not None else "unmatched"
+            self.registry.observe(scope["method"], route_path, status, seconds, size, stats)
+            if self.slow_request_seconds is not None and seconds >= self.slow_request_seconds:
+                self.registry.slow_requests += 1
+                logger.warning(
+                    "Requête lente : %s %s -> %s en %.0f ms (%d appels MongoDB, %.0f ms)",
+                    scope["method"], scope["path"], status, seconds * 1000,
+                    stats.db_calls, stats.db_seconds * 1000
+                )
+
+
+class InFlightLimiter:
+    # Requêtes exécutées en même temps par le processus. Motor exécute chaque
+    # opération sur un pool de MOTOR_MAX_WORKERS threads (cœurs x 5 par défaut),
+    # souvent plus petit que maxPoolSize : le pool de connexions ne sature alors
+    # jamais et l'excédent s'accumulerait sans limite dans la file de Motor.
+    # Au plus max_in_flight requêtes s'exécutent, max_waiting attendent une place
+    # au plus wait_timeout secondes ; les autres sont refusées.
+    def __init__(self, max_in_flight: int, max_waiting: int, wait_timeout: float):
+        self.max_in_flight = max_in_flight
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.slots: Optional[asyncio.Semaphore] = None
+        self.loop = None
+
+    async def acquire(self) -> bool:
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.slots = asyncio.Semaphore(self.max_in_flight)
+            self.loop = loop
+        if self.slots.locked():
+            if self.waiting >= self.max_waiting:
+                return False
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self.slots.acquire(), self.wait_timeout)
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                self.waiting -= 1
+        else:
+            await self.slots.acquire()
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self.slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+        }
+
+
+class LoadSheddingMiddleware:
+    # Middleware ASGI : répond 503 + Retry-After sans toucher à MongoDB quand le
+    # limiteur n'a plus de place ou que la file d'attente du pool dépasse
+    # max_waiting, au lieu d'y ajouter la requête
+    def __init__(
+        self,
+        app,
+        registry: MetricsRegistry,
+        pool_monitor: PoolMonitor,
+        limiter: InFlightLimiter,
+        max_waiting: int,
+        retry_after: int,
+        exempt_paths=()
+    ):
+        self.app = app
+        self.registry = registry
+        self.pool_monitor = pool_monitor
+        self.limiter = limiter
+        self.max_waiting = max_waiting
+        self.retry_after = retry_after
+        self.exempt_paths = set(exempt_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.max_waiting <= 0 or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        if self.pool_monitor.waiting < self.max_waiting and await self.limiter.acquire():
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                self.limiter.release()
+            return
+
+        self.registry.shed_requests += 1
+        body = json.dumps({"detail": "Service surchargé, réessayez plus tard"}, ensure_ascii=False).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
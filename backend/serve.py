@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Point d'entrée de production : N processus uvicorn indépendants derrière le même port
+Usage : python serve.py --workers 4 --host 0.0.0.0 --port 8001
+
+Chaque processus crée au démarrage (lifespan de server.py) son client MongoDB, sa
+file de tâches et ses caches, puis se préchauffe. Les index sont créés une seule
+fois, ici, avant le lancement des processus. Dès deux processus, le change feed
+(CHANGE_FEED=1) synchronise entre eux l'invalidation des caches et /api/events.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+import uvicorn
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Serveur de production de l'API de gestion des paies")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processus uvicorn (défaut : nombre de cœurs)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--graceful-timeout", type=int, default=30,
+                        help="secondes laissées aux requêtes en cours à l'arrêt")
+    return parser
+
+
+async def bootstrap():
+    sys.path.insert(0, BACKEND_DIR)
+    import server
+
+    server.connect_db()
+    try:
+        await server.bootstrap_db()
+    finally:
+        server.close_db()
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.workers > 1:
+        os.environ.setdefault("CHANGE_FEED", "1")
+    # Hérité par les processus : ils ne recréent pas les index
+    os.environ["STARTUP_BOOTSTRAP"] = "0"
+    asyncio.run(bootstrap())
+
+    uvicorn.run(
+        "server:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        app_dir=BACKEND_DIR,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,32 +1,233 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, Header, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, CursorType, IndexModel, ReplaceOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, CollectionInvalid, ConnectionFailure, DuplicateKeyError, PyMongoError
 import os
+import asyncio
+import httpx
+import base64
+import codecs
+import csv
+import hashlib
+import io
+import json
 import logging
+import re
+import time
+import unicodedata
+import orjson
 from pathlib import Path
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError, field_validator
 from typing import List, Optional
+from collections import OrderedDict, defaultdict
+from contextlib import asynccontextmanager
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, ROUND_HALF_UP
 from enum import Enum
+from compression import CompressionMiddleware
+from jobs import JobQueue
+from metrics import (
+    DbCommandMonitor, InFlightLimiter, LoadSheddingMiddleware, MetricsMiddleware, MetricsRegistry, PoolMonitor
+)
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Instrumentation (exposée sur /api/metrics)
+db_monitor = DbCommandMonitor()
+pool_monitor = PoolMonitor()
+metrics_registry = MetricsRegistry()
+SLOW_REQUEST_MS = os.environ.get("SLOW_REQUEST_MS")
+
 # MongoDB connection
+# Pool et délais bornés : pendant un pic, une requête attend une connexion au plus
+# MONGO_WAIT_QUEUE_TIMEOUT_MS puis reçoit un 503 ; au-delà de MONGO_MAX_WAITING
+# requêtes en attente, les nouvelles sont refusées (503) sans attendre.
+# Le nombre de requêtes exécutées en même temps est aussi borné (MAX_IN_FLIGHT, par
+# défaut le plus petit du pool et des threads de Motor) : sinon, avec moins de 20
+# cœurs, l'attente se fait dans la file de Motor et non dans celle du pool.
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+MONGO_OPTIONS = {
+    "maxPoolSize": int(os.environ.get("MONGO_MAX_POOL_SIZE", "100")),
+    "minPoolSize": int(os.environ.get("MONGO_MIN_POOL_SIZE", "0")),
+    "waitQueueTimeoutMS": int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000")),
+    "serverSelectionTimeoutMS": int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+    "readPreference": os.environ.get("MONGO_READ_PREFERENCE", "primary"),
+}
+MONGO_MAX_WAITING = int(os.environ.get("MONGO_MAX_WAITING", str(MONGO_OPTIONS["maxPoolSize"])))  # 0 : désactivé
+MOTOR_MAX_WORKERS = int(os.environ.get("MOTOR_MAX_WORKERS", str((os.cpu_count() or 1) * 5)))
+MAX_IN_FLIGHT = int(os.environ.get("MAX_IN_FLIGHT", str(min(MOTOR_MAX_WORKERS, MONGO_OPTIONS["maxPoolSize"]))))
+request_limiter = InFlightLimiter(MAX_IN_FLIGHT, MONGO_MAX_WAITING, MONGO_OPTIONS["waitQueueTimeoutMS"] / 1000)
+RETRY_AFTER_SECONDS = int(os.environ.get("RETRY_AFTER_SECONDS", "1"))
+HEALTH_PING_TIMEOUT = 2.0
+DB_NAME = os.environ['DB_NAME']
+
+# Un client par processus, créé au démarrage (lifespan) et non à l'import : un
+# client Motor ne doit pas traverser un fork. Les scripts (manage.py, benchmarks)
+# appellent connect_db() eux-mêmes.
+client: Optional[AsyncIOMotorClient] = None
+db = None
+
+
+def create_client() -> AsyncIOMotorClient:
+    return AsyncIOMotorClient(mongo_url, event_listeners=[db_monitor, pool_monitor], **MONGO_OPTIONS)
+
+
+def connect_db():
+    global client, db, transactions_supported
+    client = create_client()
+    db = client[DB_NAME]
+    transactions_supported = None
+
+
+def close_db():
+    global client, db
+    if client is not None:
+        client.close()
+    client = None
+    db = None
+
+
+# Multi-document transactions
+# Les écritures qui doivent être atomiques (création d'une transaction, suppression
+# d'un ouvrier) passent par run_write(callback). MONGO_TRANSACTIONS=auto les exécute
+# dans une transaction MongoDB si le déploiement en accepte (replica set, cluster
+# shardé), "on" l'impose, "off" l'interdit : callback(None) s'exécute alors hors
+# transaction et doit rester correct seul (ordre des écritures et compensation).
+MONGO_TRANSACTIONS = os.environ.get("MONGO_TRANSACTIONS", "auto")
+if MONGO_TRANSACTIONS not in ("auto", "on", "off"):
+    raise ValueError("MONGO_TRANSACTIONS doit valoir auto, on ou off")
+transactions_supported: Optional[bool] = None
+
+
+async def use_transactions() -> bool:
+    global transactions_supported
+    if MONGO_TRANSACTIONS != "auto":
+        return MONGO_TRANSACTIONS == "on"
+    if transactions_supported is None:
+        hello = await db.command("hello")
+        transactions_supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+    return transactions_supported
+
+
+async def run_write(callback):
+    # with_transaction rejoue callback(session) sur erreur transitoire (WriteConflict...)
+    if not await use_transactions():
+        return await callback(None)
+    async with await client.start_session() as session:
+        return await session.with_transaction(callback)
+
+
+# Startup
+# STARTUP_BOOTSTRAP=0 : les index sont déjà créés (serve.py le fait une fois avant
+# de lancer les processus). WARMUP_PATHS : lectures exécutées au démarrage pour
+# ouvrir le pool et remplir le cache des soldes du processus.
+STARTUP_BOOTSTRAP = os.environ.get("STARTUP_BOOTSTRAP", "1") == "1"
+WARMUP_PATHS = [path for path in os.environ.get("WARMUP_PATHS", "/api/workers-summary?limit=1000").split(",") if path]
+
+
+async def bootstrap_db():
+    await ensure_archive_collection()  # avant ses index, qui la créeraient sans compression
+    await ensure_indexes()
+    await change_feed.ensure_collection()
+
+
+async def warm_up(app: FastAPI):
+    try:
+        await db.command("ping")
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://warmup") as http:
+            for path in WARMUP_PATHS:
+                response = await http.get(path)
+                if response.status_code >= 400:
+                    logger.warning("Préchauffage de %s : statut %s", path, response.status_code)
+    except (PyMongoError, httpx.HTTPError) as e:
+        logger.warning("Préchauffage interrompu : %s", e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    connect_db()
+    if STARTUP_BOOTSTRAP:
+        await bootstrap_db()
+        logger.info("Index MongoDB vérifiés")
+    await job_queue.start(db.jobs)
+    change_feed.start()
+    await warm_up(app)
+    yield
+    await change_feed.stop()
+    await job_queue.stop()
+    close_db()
+
 
 # Create the main app without a prefix
-app = FastAPI()
+# Réponses encodées par orjson (datetime, enum et float natifs)
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
 
+# Pool saturé ou serveur injoignable : erreur temporaire, le client peut réessayer
+@app.exception_handler(ConnectionFailure)
+async def database_unavailable(request: Request, exc: ConnectionFailure):
+    logger.warning("MongoDB indisponible : %s %s -> %s", request.method, request.url.path, exc)
+    return ORJSONResponse(
+        {"detail": "Base de données indisponible, réessayez plus tard"},
+        status_code=503,
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+    )
+
+
+# Money
+# Les montants sont stockés en centimes entiers (amount_cents, due_cents,
+# paid_cents) : les $inc et $sum de MongoDB et les sommes en Python sont exacts.
+# L'API reçoit et renvoie toujours des montants décimaux.
+# MAX_AMOUNT_CENTS borne chaque montant : les entiers MongoDB sont limités à 64 bits
+# et les totaux du ledger doivent y tenir.
+MAX_AMOUNT_CENTS = 10 ** 12
+
+
+def to_cents(amount: float) -> int:
+    cents = Decimal(str(amount)).scaleb(2)
+    if not cents.is_finite() or cents != cents.to_integral_value():
+        raise ValueError("Montant invalide : deux décimales au plus")
+    if abs(cents) > MAX_AMOUNT_CENTS:
+        raise ValueError(f"Montant invalide : {from_cents(MAX_AMOUNT_CENTS):.2f} au plus")
+    return int(cents)
+
+
+def round_to_cents(amount: float) -> int:
+    # Montants historiques, enregistrés avant le passage aux centimes
+    return int(Decimal(str(amount)).scaleb(2).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents: int) -> float:
+    return cents / 100
+
+
+def transaction_document(transaction: dict) -> dict:
+    # Document stocké : amount remplacé par amount_cents
+    document = dict(transaction)
+    document["amount_cents"] = to_cents(document.pop("amount"))
+    return document
+
+
+def public_totals(totals: dict) -> dict:
+    # Totaux internes en centimes (ledger_entry) -> montants exposés par l'API
+    return {
+        "total_due": from_cents(totals["due_cents"]),
+        "total_paid": from_cents(totals["paid_cents"]),
+        "balance": from_cents(totals["due_cents"] - totals["paid_cents"]),
+        "transaction_count": totals["transaction_count"],
+    }
+
+
 # Define Models
 class TransactionType(str, Enum):
     DUE = "due"  # Montant dû
@@ -61,157 +262,2111 @@ class TransactionCreate(BaseModel):
     type: TransactionType
     amount: float
     description: Optional[str] = None
+    
+    @field_validator("amount")
+    @classmethod
+    def check_cents(cls, amount: float) -> float:
+        to_cents(amount)
+        return amount
+
+
+class TransactionImport(TransactionCreate):
+    date: Optional[datetime] = None  # date de l'événement, maintenant par défaut
+    
+    @field_validator("date")
+    @classmethod
+    def check_date(cls, date: Optional[datetime]) -> Optional[datetime]:
+        # Dates avec fuseau ramenées en UTC naïf, comparables aux dates stockées
+        return utc_naive(date)
+
 
+class BulkImportError(BaseModel):
+    line: int
+    error: str
 
-class WorkerBalance(BaseModel):
+
+class BulkImportResult(BaseModel):
+    inserted: int
+    error_count: int
+    errors: List[BulkImportError]  # limité à MAX_REPORTED_ERRORS
+
+
+class WorkerSummary(BaseModel):
     worker: Worker
     total_due: float
     total_paid: float
     balance: float  # total_due - total_paid
+    transaction_count: int = 0
+
+
+class WorkerBalance(WorkerSummary):
     transactions: List[Transaction]
+    transactions_next_cursor: Optional[str] = None  # page suivante de l'historique
+
+
+class BalanceBatchRequest(BaseModel):
+    worker_ids: List[str]
+
+
+class BalanceBatchItem(BaseModel):
+    worker_id: str
+    balance: Optional[WorkerSummary] = None
+    error: Optional[str] = None  # renseigné si l'ouvrier n'existe pas
+
+
+class SyncDeletion(BaseModel):
+    type: str  # "worker" ou "transaction"
+    id: str
+    worker_id: str
+
+
+class SyncBalance(BaseModel):
+    worker_id: str
+    total_due: float
+    total_paid: float
+    balance: float
+    transaction_count: int
+
+
+class SyncResponse(BaseModel):
+    workers: List[Worker]
+    transactions: List[Transaction]
+    deleted: List[SyncDeletion]
+    balances: List[SyncBalance]  # soldes actuels des ouvriers concernés
+    token: str  # à renvoyer dans ?since= à la prochaine synchronisation
+    has_more: bool
+
+
+class PeriodTotals(BaseModel):
+    period: datetime  # début de la période
+    worker_id: Optional[str] = None  # group_by=worker
+    name: Optional[str] = None  # group_by=worker
+    position: Optional[str] = None
+    total_due: float
+    total_paid: float
+    balance: float
+    transaction_count: int
+
+
+# Projections des lectures : seuls les champs exposés par l'API, sans _id.
+# Les documents lus ont été validés à l'écriture ; les endpoints de lecture
+# les renvoient tels quels, sans reconstruire les modèles Pydantic, et les
+# response_model ne servent plus qu'à la documentation OpenAPI.
+WORKER_FIELDS = {"_id": 0, **{name: 1 for name in Worker.model_fields}}
+# amount est recalculé par MongoDB depuis amount_cents (projection calculée, MongoDB >= 4.4).
+TRANSACTION_FIELDS = {
+    "_id": 0,
+    **{name: 1 for name in Transaction.model_fields if name != "amount"},
+    "amount": {"$divide": ["$amount_cents", 100]},
+}
+
+# Un ouvrier supprimé reçoit deleted_at et disparaît aussitôt des lectures ; ses
+# transactions et le document lui-même sont purgés par une tâche de fond.
+ACTIVE_WORKERS = {"deleted_at": None}
+
+
+# Pagination par curseur (keyset sur (champ de tri, id)) : le coût d'une page
+# ne dépend pas de sa profondeur. Le curseur de la page suivante est renvoyé
+# dans l'en-tête X-Next-Cursor, absent sur la dernière page.
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(doc: dict, sort_field: str) -> str:
+    payload = json.dumps([doc[sort_field].isoformat(), doc["id"]])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        last_value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(last_value), str(last_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+
+
+def keyset_query(query: dict, sort_field: str, descending: bool, cursor: Optional[str]) -> dict:
+    if not cursor:
+        return query
+    last_value, last_id = decode_cursor(cursor)
+    return keyset_after(query, sort_field, descending, last_value, last_id)
+
+
+def keyset_after(query: dict, sort_field: str, descending: bool, last_value, last_id: str) -> dict:
+    op = "$lt" if descending else "$gt"
+    after_cursor = {"$or": [
+        {sort_field: {op: last_value}},
+        {sort_field: last_value, "id": {op: last_id}},
+    ]}
+    return {"$and": [query, after_cursor]} if query else after_cursor
+
+
+def keyset_sort(sort_field: str, descending: bool) -> list:
+    direction = -1 if descending else 1
+    return [(sort_field, direction), ("id", direction)]
+
+
+def split_page(docs: list, sort_field: str, limit: int):
+    # Les requêtes lisent limit + 1 documents pour savoir s'il reste une page
+    if len(docs) > limit:
+        docs = docs[:limit]
+        return docs, encode_cursor(docs[-1], sort_field)
+    return docs, None
+
+
+async def paginate(
+    collection,
+    query: dict,
+    sort_field: str,
+    descending: bool,
+    limit: int,
+    cursor: Optional[str],
+    projection: Optional[dict] = None
+):
+    docs = await collection.find(keyset_query(query, sort_field, descending, cursor), projection) \
+        .sort(keyset_sort(sort_field, descending)) \
+        .to_list(limit + 1)
+    return split_page(docs, sort_field, limit)
+
+
+def page_response(docs: list, next_cursor: Optional[str]) -> Response:
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return ORJSONResponse(docs, headers=headers)
+
+
+# Balance cache
+# Cache en mémoire du processus des réponses de solde déjà sérialisées, regroupées
+# par ouvrier : une écriture invalide le groupe de l'ouvrier et celui des listes.
+# Tout objet exposant get/set/generation/invalidate/stats peut le remplacer.
+ALL_WORKERS = "*"
+
+
+class BalanceCache:
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (groupe, clé) -> (expiration, valeur)
+        self.generations = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+    
+    def get(self, group: str, key: str):
+        item = self.entries.get((group, key))
+        if item is None or item[0] < time.monotonic():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return item[1]
+    
+    def generation(self, group: str) -> int:
+        return self.generations[group] + self.generations[ALL_WORKERS]
+    
+    def set(self, group: str, key: str, value, generation: int):
+        # Une invalidation survenue pendant le calcul rend la valeur obsolète
+        if self.ttl <= 0 or generation != self.generation(group):
+            return
+        self.entries[(group, key)] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end((group, key))
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+    
+    def invalidate(self, *worker_ids: str):
+        groups = {ALL_WORKERS, *worker_ids}
+        for group in groups:
+            self.generations[group] += 1
+        for cache_key in [cache_key for cache_key in self.entries if cache_key[0] in groups]:
+            del self.entries[cache_key]
+        self.invalidations += 1
+    
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "invalidations": self.invalidations,
+        }
+
+
+balance_cache = BalanceCache(
+    ttl=float(os.environ.get("BALANCE_CACHE_TTL", "30")),
+    max_entries=int(os.environ.get("BALANCE_CACHE_MAX_ENTRIES", "10000"))
+)
+
+
+async def cached_json(request: Request, group: str, compute) -> Response:
+    # compute() retourne (contenu, curseur de la page suivante) ; la clé du cache
+    # est le chemin et les paramètres de la requête
+    key = f"{request.url.path}?{request.url.query}"
+    entry = balance_cache.get(group, key)
+    if entry is None:
+        generation = balance_cache.generation(group)
+        content, next_cursor = await compute()
+        body = orjson.dumps(content)
+        headers = {"ETag": f'"{hashlib.sha1(body).hexdigest()}"', "Cache-Control": CACHE_CONTROL}
+        if next_cursor:
+            headers[NEXT_CURSOR_HEADER] = next_cursor
+        entry = (body, headers)
+        balance_cache.set(group, key, entry, generation)
+    
+    body, headers = entry
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        balance_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+# HTTP caching
+# Un compteur de version par collection (db.collection_versions), incrémenté par
+# notify_change après chaque écriture. L'ETag des listes est dérivé de l'URL et des
+# versions lues avant la requête : un If-None-Match à jour reçoit un 304 sans
+# aucune lecture des données. La version étant lue avant les données, un ETag
+# n'annonce jamais des données plus récentes que celles envoyées.
+CACHE_CONTROL = os.environ.get("HTTP_CACHE_CONTROL", "private, no-cache")
+
+
+async def collection_versions(collections) -> dict:
+    versions = {name: 0 for name in collections}
+    async for doc in db.collection_versions.find({"_id": {"$in": list(collections)}}):
+        versions[doc["_id"]] = doc["version"]
+    return versions
+
+
+async def bump_versions(collections):
+    await db.collection_versions.bulk_write(
+        [UpdateOne({"_id": name}, {"$inc": {"version": 1}}, upsert=True) for name in collections],
+        ordered=False
+    )
+
+
+async def versioned_response(request: Request, collections, respond) -> Response:
+    # respond() construit la réponse complète, appelée seulement si l'ETag a changé
+    versions = await collection_versions(collections)
+    tag = hashlib.sha1(f"{request.url.path}?{request.url.query}:{sorted(versions.items())}".encode()).hexdigest()
+    headers = {"ETag": f'"{tag}"', "Cache-Control": CACHE_CONTROL}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    response = await respond()
+    response.headers.update(headers)
+    return response
+
+
+# Event hub
+# Diffusion en mémoire du processus des changements de soldes vers les clients
+# /api/events (Server-Sent Events). Chaque message est sérialisé une seule fois ;
+# chaque abonné a une file bornée et un abonné trop lent reçoit "resync" à la
+# place des événements perdus, pour recharger les données.
+SSE_QUEUE_SIZE = 100
+SSE_HEARTBEAT_SECONDS = 15
+
+
+class EventHub:
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.subscribers = set()
+    
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        return queue
+    
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+    
+    @staticmethod
+    def format(event: str, data) -> str:
+        return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+    
+    def send(self, message: str):
+        for queue in self.subscribers:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait("event: resync\ndata: {}\n\n")
+
+
+event_hub = EventHub(queue_size=SSE_QUEUE_SIZE)
+
+# Tâches de fond (purges, recalculs) : voir "Background jobs"
+JOB_CONCURRENCY = int(os.environ.get("JOB_CONCURRENCY", "2"))
+JOB_RETENTION_DAYS = int(os.environ.get("JOB_RETENTION_DAYS", "7"))
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "60"))
+job_queue = JobQueue(concurrency=JOB_CONCURRENCY, lease_seconds=JOB_LEASE_SECONDS)
+
+
+def balance_event(worker_id: str, totals: dict) -> dict:
+    return {"worker_id": worker_id, **public_totals(totals)}
+
+
+# Change feed
+# Avec plusieurs processus (serve.py), chacun a son cache et son hub d'événements.
+# Chaque écriture est aussi ajoutée à une collection plafonnée (capped) que tous
+# les processus suivent avec un curseur tailable : ils invalident leur cache et
+# relaient les événements à leurs propres clients /api/events. Si le suivi est
+# interrompu, le processus vide ses caches et envoie "resync" à ses clients.
+CHANGE_FEED_ENABLED = os.environ.get("CHANGE_FEED", "0") == "1"
+CHANGE_FEED_SIZE = int(os.environ.get("CHANGE_FEED_SIZE", str(16 * 1024 * 1024)))  # octets
+CHANGE_FEED_RETRY_SECONDS = 1.0
+
+
+class ChangeFeed:
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.origin = str(uuid.uuid4())
+        self.task = None
+    
+    async def ensure_collection(self):
+        if not self.enabled:
+            return
+        try:
+            await db.create_collection("change_feed", capped=True, size=CHANGE_FEED_SIZE)
+            # Un curseur tailable sur une collection vide meurt aussitôt
+            await db.change_feed.insert_one({"origin": None})
+        except CollectionInvalid:
+            pass
+    
+    async def publish(self, worker_ids: List[str], reports: bool, messages: List[str]):
+        if self.enabled:
+            await db.change_feed.insert_one({
+                "origin": self.origin, "worker_ids": worker_ids, "reports": reports, "messages": messages
+            })
+    
+    def start(self):
+        if self.enabled:
+            self.task = asyncio.create_task(self.follow())
+    
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+    
+    def apply(self, change: dict):
+        if change.get("origin") in (None, self.origin):
+            return
+        balance_cache.invalidate(*change["worker_ids"])
+        if change["reports"]:
+            report_cache.invalidate()
+        for message in change["messages"]:
+            event_hub.send(message)
+    
+    async def follow(self):
+        last = await db.change_feed.find_one({}, sort=[("$natural", -1)])
+        last_id = last["_id"] if last else None
+        while True:
+            try:
+                query = {"_id": {"$gt": last_id}} if last_id else {}
+                cursor = db.change_feed.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    async for change in cursor:
+                        last_id = change["_id"]
+                        self.apply(change)
+            except PyMongoError as e:
+                logger.warning("Suivi du change feed interrompu : %s", e)
+            # Des changements ont pu être manqués
+            balance_cache.invalidate()
+            report_cache.invalidate()
+            event_hub.send("event: resync\ndata: {}\n\n")
+            await asyncio.sleep(CHANGE_FEED_RETRY_SECONDS)
+
+
+change_feed = ChangeFeed(enabled=CHANGE_FEED_ENABLED)
+
+
+def events_wanted() -> bool:
+    # Faut-il construire les événements (abonnés locaux ou autres processus) ?
+    return bool(event_hub.subscribers) or change_feed.enabled
+
+
+async def notify_change(
+    worker_ids: List[str] = (),
+    events: List[tuple] = (),
+    reports: bool = False,
+    collections=("transactions",)  # versions (ETag) à incrémenter
+):
+    # Point unique après une écriture : caches, versions, événements et autres processus
+    worker_ids = list(worker_ids)
+    await bump_versions(collections)
+    balance_cache.invalidate(*worker_ids)
+    if reports:
+        report_cache.invalidate()
+    messages = [event_hub.format(event, data) for event, data in events] if events_wanted() else []
+    for message in messages:
+        event_hub.send(message)
+    await change_feed.publish(worker_ids, reports, messages)
+
+
+# Index bootstrap
+# Créés au démarrage ; create_indexes est idempotent pour une même définition.
+INDEXES = {
+    "workers": [
+        IndexModel([("id", ASCENDING)], unique=True, name="workers_id"),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="workers_created_at_id"),
+        IndexModel([("search_name", ASCENDING), ("id", ASCENDING)], name="workers_search_name_id"),
+        IndexModel([("search_terms", ASCENDING)], name="workers_search_terms"),
+        IndexModel([("sync_at", ASCENDING), ("id", ASCENDING)], name="workers_sync_at_id"),
+    ],
+    "transactions": [
+        IndexModel([("id", ASCENDING)], unique=True, name="transactions_id"),
+        IndexModel(
+            [("worker_id", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)],
+            name="transactions_worker_id_date"
+        ),
+        IndexModel([("date", DESCENDING), ("id", DESCENDING)], name="transactions_date_id"),
+        IndexModel(
+            [("idempotency_key", ASCENDING)],
+            unique=True,
+            sparse=True,  # seules les transactions créées avec une clé
+            name="transactions_idempotency_key"
+        ),
+        IndexModel([("sync_at", ASCENDING), ("id", ASCENDING)], name="transactions_sync_at_id"),
+    ],
+    "transactions_archive": [
+        IndexModel([("id", ASCENDING)], unique=True, name="transactions_archive_id"),
+        IndexModel(
+            [("worker_id", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)],
+            name="transactions_archive_worker_id_date"
+        ),
+        IndexModel([("date", DESCENDING), ("id", DESCENDING)], name="transactions_archive_date_id"),
+    ],
+    "sync_tombstones": [
+        IndexModel([("sync_at", ASCENDING), ("id", ASCENDING)], name="sync_tombstones_sync_at_id"),
+    ],
+    "balance_checkpoints": [
+        IndexModel(
+            [("worker_id", ASCENDING), ("period_end", DESCENDING)],
+            unique=True, name="balance_checkpoints_worker_id_period_end"
+        ),
+    ],
+    "jobs": [
+        IndexModel([("id", ASCENDING)], unique=True, name="jobs_id"),
+        IndexModel([("status", ASCENDING)], name="jobs_status"),
+        IndexModel(
+            [("finished_at", ASCENDING)],
+            expireAfterSeconds=JOB_RETENTION_DAYS * 86400,
+            name="jobs_finished_at_ttl"
+        ),
+    ],
+}
+
+
+async def ensure_indexes():
+    for collection_name, indexes in INDEXES.items():
+        await db[collection_name].create_indexes(indexes)
+
+
+# Balance ledger
+# Un document par ouvrier dans db.worker_balances (_id = worker_id), tenu à jour
+# par des $inc atomiques à chaque écriture : la lecture d'un solde coûte O(1).
+def ledger_field(transaction_type: TransactionType) -> str:
+    return "due_cents" if transaction_type == TransactionType.DUE else "paid_cents"
+
+
+def ledger_entry(entry: Optional[dict] = None) -> dict:
+    # Un ouvrier sans document dans le ledger n'a aucune transaction
+    entry = entry or {}
+    return {
+        "due_cents": entry.get("due_cents", 0),
+        "paid_cents": entry.get("paid_cents", 0),
+        "transaction_count": entry.get("transaction_count", 0),
+    }
+
+
+def add_totals(totals: dict, other: dict) -> dict:
+    return {field: totals[field] + other[field] for field in totals}
+
+
+async def ledger_apply(
+    worker_id: str,
+    transaction_type: TransactionType,
+    amount_cents: int,
+    count: int = 1,
+    session=None
+) -> dict:
+    # Retourne les totaux mis à jour, dans le même aller-retour que le $inc
+    entry = await db.worker_balances.find_one_and_update(
+        {"_id": worker_id},
+        {"$inc": {ledger_field(transaction_type): amount_cents, "transaction_count": count}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    return ledger_entry(entry)
+
+
+async def ledger_apply_many(transactions: List[dict]):
+    # Regroupe les montants par ouvrier : un seul $inc par ouvrier et par lot
+    increments = {}
+    for transaction in transactions:
+        inc = increments.setdefault(transaction["worker_id"], {"transaction_count": 0})
+        field = ledger_field(transaction["type"])
+        inc[field] = inc.get(field, 0) + transaction["amount_cents"]
+        inc["transaction_count"] += 1
+    if increments:
+        await db.worker_balances.bulk_write(
+            [UpdateOne({"_id": worker_id}, {"$inc": inc}, upsert=True) for worker_id, inc in increments.items()],
+            ordered=False
+        )
+
+
+async def ledger_totals(worker_ids: List[str]) -> dict:
+    totals = {worker_id: ledger_entry() for worker_id in worker_ids}
+    async for entry in db.worker_balances.find({"_id": {"$in": worker_ids}}):
+        totals[entry["_id"]] = ledger_entry(entry)
+    return totals
+
+
+def totals_group_stage(group_id="$worker_id") -> dict:
+    # Étape $group calculant les totaux du ledger par ouvrier (ou par la clé donnée)
+    return {"$group": {
+        "_id": group_id,
+        "due_cents": {"$sum": {"$cond": [{"$eq": ["$type", TransactionType.DUE.value]}, "$amount_cents", 0]}},
+        "paid_cents": {"$sum": {"$cond": [{"$eq": ["$type", TransactionType.PAID.value]}, "$amount_cents", 0]}},
+        "transaction_count": {"$sum": 1},
+    }}
+
+
+# Ledger lock
+# Réconciliation, checkpoints et archivage ne se chevauchent pas : l'archivage
+# déplace des transactions entre les collections qu'ils relisent. Le verrou est un
+# bail (db.maintenance_locks) qui expire seul si le processus qui le tient meurt ;
+# une opération longue le prolonge avec renew().
+LEDGER_LOCK_ID = "ledger"
+LEDGER_LOCK_SECONDS = int(os.environ.get("LEDGER_LOCK_SECONDS", "600"))
+
+
+class LedgerBusy(RuntimeError):
+    pass
+
+
+async def ledger_lock_holder() -> Optional[dict]:
+    return await db.maintenance_locks.find_one({"_id": LEDGER_LOCK_ID, "expires_at": {"$gte": datetime.utcnow()}})
+
+
+@asynccontextmanager
+async def ledger_lock(operation: str):
+    owner = str(uuid.uuid4())
+    
+    async def renew():
+        now = datetime.utcnow()
+        try:
+            await db.maintenance_locks.update_one(
+                {"_id": LEDGER_LOCK_ID, "$or": [{"owner": owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {
+                    "owner": owner,
+                    "operation": operation,
+                    "expires_at": now + timedelta(seconds=LEDGER_LOCK_SECONDS),
+                }},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            holder = await ledger_lock_holder()
+            raise LedgerBusy(f"Opération en cours sur les soldes : {holder['operation'] if holder else 'inconnue'}")
+    
+    await renew()
+    try:
+        yield renew
+    finally:
+        await db.maintenance_locks.delete_one({"_id": LEDGER_LOCK_ID, "owner": owner})
+
+
+# Reconstruit db.worker_balances depuis db.transactions et retourne les écarts trouvés
+async def reconcile_ledger(dry_run: bool = False) -> List[dict]:
+    async with ledger_lock("reconcile"):
+        # Totaux reportés à jour, y compris après un archivage interrompu
+        await refresh_archive_totals()
+        expected = {}
+        async for row in db.transactions.aggregate([totals_group_stage()]):
+            expected[row["_id"]] = ledger_entry(row)
+        # Transactions archivées : totaux reportés, sans relire l'archive
+        async for carried in db.archive_totals.find():
+            expected[carried["_id"]] = add_totals(expected.get(carried["_id"], ledger_entry()), ledger_entry(carried))
+        
+        current = {}
+        async for entry in db.worker_balances.find():
+            current[entry["_id"]] = ledger_entry(entry)
+        
+        drifts = []
+        for worker_id in sorted(expected.keys() | current.keys()):
+            expected_entry = expected.get(worker_id, ledger_entry())
+            current_entry = current.get(worker_id, ledger_entry())
+            if expected_entry != current_entry:
+                drifts.append({
+                    "worker_id": worker_id,
+                    "ledger": current_entry,
+                    "expected": expected_entry,
+                })
+        
+        if not dry_run:
+            for drift in drifts:
+                if drift["worker_id"] in expected:
+                    await db.worker_balances.replace_one(
+                        {"_id": drift["worker_id"]}, drift["expected"], upsert=True
+                    )
+                else:
+                    await db.worker_balances.delete_one({"_id": drift["worker_id"]})
+            if drifts:
+                await notify_change([drift["worker_id"] for drift in drifts])
+        
+        return drifts
+
+
+# Balance checkpoints
+# Un checkpoint stocke les totaux cumulés d'un ouvrier pour toutes ses transactions
+# antérieures à period_end (début d'une période close). Le solde à une date X est
+# le dernier checkpoint avant X plus les seules transactions qui le suivent.
+# Les checkpoints sont créés par "manage.py checkpoint" (à planifier, ex. cron) ;
+# une transaction supprimée ou importée dans une période close les corrige par $inc.
+CHECKPOINT_PERIODS = ("day", "week", "month")
+CHECKPOINT_PERIOD = os.environ.get("BALANCE_CHECKPOINT_PERIOD", "month")
+if CHECKPOINT_PERIOD not in CHECKPOINT_PERIODS:
+    raise ValueError(f"BALANCE_CHECKPOINT_PERIOD doit valoir {', '.join(CHECKPOINT_PERIODS)}")
+CHECKPOINT_STATE_ID = "balance_checkpoints"
+
+
+def period_start(moment: datetime, period: str) -> datetime:
+    start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "week":
+        return start - timedelta(days=start.weekday())
+    if period == "month":
+        return start.replace(day=1)
+    return start
+
+
+def next_period_start(start: datetime, period: str) -> datetime:
+    if period == "day":
+        return start + timedelta(days=1)
+    if period == "week":
+        return start + timedelta(weeks=1)
+    return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+
+
+def date_trunc(period: str) -> dict:
+    # Équivalent MongoDB de period_start (MongoDB >= 5.0)
+    options = {"date": "$date", "unit": period}
+    if period == "week":
+        options["startOfWeek"] = "monday"
+    return {"$dateTrunc": options}
+
+
+def checkpoint_update(transaction: dict, sign: int) -> UpdateMany:
+    # Corrige les checkpoints postérieurs à la date d'une transaction (sign = +1 ou -1)
+    return UpdateMany(
+        {"worker_id": transaction["worker_id"], "period_end": {"$gt": transaction["date"]}},
+        {"$inc": {
+            ledger_field(transaction["type"]): sign * transaction["amount_cents"],
+            "transaction_count": sign,
+        }}
+    )
+
+
+async def checkpoints_apply(transactions: List[dict], sign: int):
+    # Seules les transactions datées d'une période close peuvent toucher un checkpoint
+    closed_before = period_start(datetime.utcnow(), CHECKPOINT_PERIOD)
+    updates = [checkpoint_update(t, sign) for t in transactions if t["date"] < closed_before]
+    if updates:
+        await db.balance_checkpoints.bulk_write(updates, ordered=False)
+
+
+async def latest_checkpoints(worker_ids: List[str], before: Optional[datetime] = None) -> dict:
+    match = {"worker_id": {"$in": worker_ids}}
+    if before:
+        match["period_end"] = {"$lte": before}
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"worker_id": 1, "period_end": -1}},
+        {"$group": {"_id": "$worker_id", "checkpoint": {"$first": "$$ROOT"}}},
+    ]
+    return {row["_id"]: row["checkpoint"] async for row in db.balance_checkpoints.aggregate(pipeline)}
+
+
+async def create_checkpoints(now: Optional[datetime] = None) -> int:
+    # Crée les checkpoints des périodes closes depuis la dernière exécution
+    # Sous le verrou du ledger : un lot en cours d'archivage est un instant dans les
+    # deux collections lues par aggregate_history, et serait compté deux fois
+    async with ledger_lock("checkpoint"):
+        closed_before = period_start(now or datetime.utcnow(), CHECKPOINT_PERIOD)
+        state = await db.checkpoint_state.find_one({"_id": CHECKPOINT_STATE_ID})
+        watermark = state["closed_before"] if state else None
+        if watermark and watermark >= closed_before:
+            return 0
+        
+        date_filter = {"$lt": closed_before}
+        if watermark:
+            date_filter["$gte"] = watermark
+        pipeline = [
+            {"$match": {"date": date_filter}},
+            totals_group_stage({"worker_id": "$worker_id", "period": date_trunc(CHECKPOINT_PERIOD)}),
+        ]
+        buckets = defaultdict(dict)
+        async for row in aggregate_history(pipeline):
+            worker_buckets = buckets[row["_id"]["worker_id"]]
+            period = row["_id"]["period"]
+            worker_buckets[period] = add_totals(worker_buckets.get(period, ledger_entry()), ledger_entry(row))
+        
+        previous = await latest_checkpoints(list(buckets))
+        # Passage incrémental : les transactions d'un ouvrier entre son dernier checkpoint
+        # (ou le début de l'historique) et le passage précédent (import daté d'une période
+        # close sans checkpoint ultérieur) ne sont comptées nulle part, et checkpoints_apply
+        # n'a rien pu corriger
+        if watermark:
+            gaps = defaultdict(list)
+            for worker_id in buckets:
+                checkpoint = previous.get(worker_id)
+                if not checkpoint or checkpoint["period_end"] < watermark:
+                    gaps[checkpoint["period_end"] if checkpoint else None].append(worker_id)
+            clauses = [
+                {"worker_id": {"$in": worker_ids}, "date": {"$lt": watermark, **({"$gte": since} if since else {})}}
+                for since, worker_ids in gaps.items()
+            ]
+            if clauses:
+                pipeline = [{"$match": {"$or": clauses}}, totals_group_stage()]
+                async for row in aggregate_history(pipeline):
+                    previous[row["_id"]] = add_totals(ledger_entry(previous.get(row["_id"])), ledger_entry(row))
+        operations = []
+        for worker_id, worker_buckets in buckets.items():
+            running = ledger_entry(previous.get(worker_id))
+            for bucket_start, totals in sorted(worker_buckets.items()):
+                running = add_totals(running, totals)
+                period_end = next_period_start(bucket_start, CHECKPOINT_PERIOD)
+                operations.append(ReplaceOne(
+                    {"worker_id": worker_id, "period_end": period_end},
+                    {"worker_id": worker_id, "period_end": period_end, **running},
+                    upsert=True
+                ))
+        for start in range(0, len(operations), BULK_BATCH_SIZE):
+            await db.balance_checkpoints.bulk_write(operations[start:start + BULK_BATCH_SIZE], ordered=False)
+        
+        await db.checkpoint_state.replace_one(
+            {"_id": CHECKPOINT_STATE_ID}, {"closed_before": closed_before}, upsert=True
+        )
+        return len(operations)
+
+
+async def totals_as_of(worker_id: str, as_of: datetime) -> dict:
+    checkpoint = (await latest_checkpoints([worker_id], before=as_of)).get(worker_id)
+    date_filter = {"$lt": as_of}
+    if checkpoint:
+        date_filter["$gte"] = checkpoint["period_end"]
+    pipeline = [{"$match": {"worker_id": worker_id, "date": date_filter}}, totals_group_stage()]
+    totals = ledger_entry(checkpoint)
+    async for row in aggregate_history(pipeline):
+        totals = add_totals(totals, ledger_entry(row))
+    return totals
+
+
+# Cents migration
+# "manage.py migrate-cents" convertit les transactions enregistrées avec un montant
+# décimal (amount) puis reconstruit le ledger et les checkpoints en centimes.
+# Idempotent ; à exécuter avant de servir cette version de l'API.
+async def migrate_amounts_to_cents() -> dict:
+    converted = 0
+    rounded = 0
+    cursor = db.transactions.find({"amount_cents": {"$exists": False}}, {"_id": 1, "amount": 1})
+    async for batch in iter_batches(cursor, BULK_BATCH_SIZE):
+        operations = []
+        for transaction in batch:
+            cents = round_to_cents(transaction["amount"])
+            if cents != Decimal(str(transaction["amount"])).scaleb(2):
+                rounded += 1
+            operations.append(UpdateOne(
+                {"_id": transaction["_id"], "amount_cents": {"$exists": False}},
+                {"$set": {"amount_cents": cents}, "$unset": {"amount": ""}}
+            ))
+        result = await db.transactions.bulk_write(operations, ordered=False)
+        converted += result.modified_count
+    
+    # Ledger : les anciens totaux décimaux sont retirés puis recalculés
+    await db.worker_balances.update_many({}, {"$unset": {"total_due": "", "total_paid": ""}})
+    drifts = await reconcile_ledger()
+    
+    # Checkpoints : recréés depuis le début de l'historique
+    await db.balance_checkpoints.delete_many({})
+    await db.checkpoint_state.delete_one({"_id": CHECKPOINT_STATE_ID})
+    checkpoints = await create_checkpoints()
+    
+    return {"converted": converted, "rounded": rounded, "ledger_fixed": len(drifts), "checkpoints": checkpoints}
+
+
+# Transaction archive
+# Les transactions antérieures à ARCHIVE_AFTER_DAYS jours (arrondi au jour) sont
+# déplacées par la tâche "archive_transactions" dans db.transactions_archive,
+# compressée en zstd, pour que db.transactions et ses index restent petits.
+# Le ledger garde les totaux de tout l'historique ; db.archive_totals reporte par
+# ouvrier les totaux archivés pour reconcile_ledger. Les totaux par période
+# (checkpoints, rapports, exports) lisent les deux collections ; l'historique
+# paginé n'inclut l'archive qu'avec ?include_archive=true.
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", "365"))
+ARCHIVE_STORAGE = {"wiredTiger": {"configString": "block_compressor=zstd"}}
+
+
+async def ensure_archive_collection():
+    try:
+        await db.create_collection("transactions_archive", storageEngine=ARCHIVE_STORAGE)
+    except CollectionInvalid:
+        pass
+
+
+def history_collections(include_archive: bool = True) -> list:
+    return [db.transactions, db.transactions_archive] if include_archive else [db.transactions]
+
+
+async def aggregate_history(pipeline: List[dict]):
+    # Le $match du pipeline porte sur la date : hors de la période archivée,
+    # l'archive ne coûte qu'une recherche dans son index
+    for collection in history_collections():
+        async for row in collection.aggregate(pipeline):
+            yield row
+
+
+async def paginate_history(query: dict, limit: int, cursor: Optional[str], include_archive: bool):
+    # Une page par collection avec le même curseur, fusionnées sur (date, id)
+    pages = await asyncio.gather(*(
+        collection.find(keyset_query(query, "date", True, cursor), TRANSACTION_FIELDS)
+        .sort(keyset_sort("date", True))
+        .to_list(limit + 1)
+        for collection in history_collections(include_archive)
+    ))
+    docs = sorted(
+        (doc for page in pages for doc in page),
+        key=lambda doc: (doc["date"], doc["id"]),
+        reverse=True
+    )
+    return split_page(docs, "date", limit)
+
+
+async def refresh_archive_totals():
+    # Recalcule les totaux reportés des ouvriers marqués "stale" par archive_transactions
+    while True:
+        worker_ids = [
+            carried["_id"]
+            async for carried in db.archive_totals.find({"stale": True}, {"_id": 1}).limit(BULK_BATCH_SIZE)
+        ]
+        if not worker_ids:
+            return
+        totals = {worker_id: ledger_entry() for worker_id in worker_ids}
+        pipeline = [{"$match": {"worker_id": {"$in": worker_ids}}}, totals_group_stage()]
+        async for row in db.transactions_archive.aggregate(pipeline):
+            totals[row["_id"]] = ledger_entry(row)
+        await db.archive_totals.bulk_write(
+            [ReplaceOne({"_id": worker_id}, worker_totals, upsert=True) for worker_id, worker_totals in totals.items()],
+            ordered=False
+        )
+
+
+async def archive_transactions(now: Optional[datetime] = None) -> dict:
+    # Chaque lot est copié dans l'archive, ses ouvriers marqués "stale", puis il est
+    # retiré de db.transactions : une exécution interrompue est reprise sans perte
+    # ni double comptage (copie idempotente sur id, totaux recalculés à la fin).
+    async with ledger_lock("archive") as renew:
+        archived_before = period_start((now or datetime.utcnow()) - timedelta(days=ARCHIVE_AFTER_DAYS), "day")
+        archived = 0
+        cursor = db.transactions.find({"date": {"$lt": archived_before}}, {"_id": 0}) \
+            .sort(keyset_sort("date", False))
+        async for batch in iter_batches(cursor, BULK_BATCH_SIZE):
+            try:
+                await db.transactions_archive.insert_many(batch, ordered=False)
+            except BulkWriteError as e:
+                # Transactions déjà copiées par une exécution interrompue
+                if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                    raise
+            worker_ids = list({transaction["worker_id"] for transaction in batch})
+            await db.archive_totals.bulk_write(
+                [UpdateOne({"_id": worker_id}, {"$set": {"stale": True}}, upsert=True) for worker_id in worker_ids],
+                ordered=False
+            )
+            archived += (await db.transactions.delete_many(
+                {"id": {"$in": [transaction["id"] for transaction in batch]}}
+            )).deleted_count
+            await notify_change(worker_ids)
+            await renew()
+        
+        await refresh_archive_totals()
+    return {"archived": archived, "archived_before": archived_before}
 
 
 # Worker endpoints
 @api_router.post("/workers", response_model=Worker)
 async def create_worker(worker_data: WorkerCreate):
     worker = Worker(**worker_data.dict())
-    await db.workers.insert_one(worker.dict())
+    await db.workers.insert_one({
+        **worker.dict(), **worker_search_fields(worker.dict()), "sync_at": datetime.utcnow()
+    })
+    await notify_change(
+        events=[("worker_created", build_worker_summary(worker.dict(), ledger_entry()))], collections=("workers",)
+    )
     return worker
 
 
 @api_router.get("/workers", response_model=List[Worker])
-async def get_workers():
-    workers = await db.workers.find().to_list(1000)
-    return [Worker(**worker) for worker in workers]
+async def get_workers(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    async def respond():
+        workers, next_cursor = await paginate(
+            db.workers, ACTIVE_WORKERS, "created_at", False, limit, cursor, WORKER_FIELDS
+        )
+        return page_response(workers, next_cursor)
+    
+    return await versioned_response(request, ("workers",), respond)
+
+
+# Worker search
+# Chaque ouvrier porte des clés de recherche normalisées (minuscules, sans accents) :
+# search_name (le nom) et search_terms (mots du nom et du poste, téléphone en
+# chiffres). Une recherche par préfixe ancrée sur ces champs utilise leurs index.
+# Classement : d'abord les noms qui commencent par la recherche, puis les ouvriers
+# dont chaque mot recherché préfixe un mot du nom, du poste ou du téléphone ;
+# par ordre alphabétique dans chaque groupe.
+SEARCH_TIERS = (0, 1)
+
+
+def normalize_search(text: Optional[str]) -> List[str]:
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return re.sub(r"[^0-9a-z]+", " ", stripped.lower()).split()
+
+
+def worker_search_fields(worker: dict) -> dict:
+    name_terms = normalize_search(worker.get("name"))
+    phone_digits = re.sub(r"\D", "", worker.get("phone") or "")
+    terms = set(name_terms) | set(normalize_search(worker.get("position"))) | set(normalize_search(worker.get("phone")))
+    if phone_digits:
+        terms.add(phone_digits)
+    return {"search_name": " ".join(name_terms), "search_terms": sorted(terms)}
+
+
+async def backfill_worker_search(rebuild: bool = False) -> int:
+    # Ajoute les clés de recherche aux ouvriers créés avant leur introduction
+    query = {} if rebuild else {"search_terms": {"$exists": False}}
+    operations = [
+        UpdateOne({"id": worker["id"]}, {"$set": worker_search_fields(worker)})
+        async for worker in db.workers.find(query, {"_id": 0, "id": 1, "name": 1, "position": 1, "phone": 1})
+    ]
+    for start in range(0, len(operations), BULK_BATCH_SIZE):
+        await db.workers.bulk_write(operations[start:start + BULK_BATCH_SIZE], ordered=False)
+    if operations:
+        # Recherches déjà servies (vides avant l'indexation) : nouvel ETag
+        await bump_versions(("workers",))
+    return len(operations)
+
+
+def search_tier_query(tier: int, terms: List[str]) -> dict:
+    name_prefix = re.compile("^" + re.escape(" ".join(terms)))
+    if tier == 0:
+        return {"search_name": name_prefix, **ACTIVE_WORKERS}
+    return {
+        "$and": [{"search_terms": re.compile("^" + re.escape(term))} for term in terms],
+        "search_name": {"$not": name_prefix},
+        **ACTIVE_WORKERS,
+    }
+
+
+def encode_search_cursor(tier: int, doc: dict) -> str:
+    payload = json.dumps([tier, doc["search_name"], doc["id"]])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_search_cursor(cursor: str):
+    try:
+        tier, last_name, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if tier not in SEARCH_TIERS:
+            raise ValueError(tier)
+        return tier, str(last_name), str(last_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+
+
+@api_router.get("/workers/search", response_model=List[Worker])
+async def search_workers(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    async def respond():
+        terms = normalize_search(q)
+        if not terms:
+            return page_response([], None)
+        
+        start_tier, last_name, last_id = decode_search_cursor(cursor) if cursor else (0, None, None)
+        projection = {**WORKER_FIELDS, "search_name": 1}
+        results = []
+        for tier in SEARCH_TIERS[start_tier:]:
+            query = search_tier_query(tier, terms)
+            if tier == start_tier and last_id is not None:
+                query = keyset_after(query, "search_name", False, last_name, last_id)
+            docs = await db.workers.find(query, projection) \
+                .sort(keyset_sort("search_name", False)) \
+                .to_list(limit + 1 - len(results))
+            results.extend((tier, doc) for doc in docs)
+            if len(results) > limit:
+                break
+        
+        next_cursor = None
+        if len(results) > limit:
+            results = results[:limit]
+            next_cursor = encode_search_cursor(*results[-1])
+        workers = []
+        for _, doc in results:
+            doc.pop("search_name")
+            workers.append(doc)
+        return page_response(workers, next_cursor)
+    
+    return await versioned_response(request, ("workers",), respond)
 
 
 @api_router.get("/workers/{worker_id}", response_model=Worker)
-async def get_worker(worker_id: str):
-    worker = await db.workers.find_one({"id": worker_id})
-    if not worker:
-        raise HTTPException(status_code=404, detail="Ouvrier non trouvé")
-    return Worker(**worker)
+async def get_worker(worker_id: str, request: Request):
+    async def respond():
+        worker = await db.workers.find_one({"id": worker_id, **ACTIVE_WORKERS}, WORKER_FIELDS)
+        if not worker:
+            raise HTTPException(status_code=404, detail="Ouvrier non trouvé")
+        return ORJSONResponse(worker)
+    
+    return await versioned_response(request, ("workers",), respond)
 
 
 # Transaction endpoints
+# Un client peut rejouer un POST (timeout, reconnexion) avec le même en-tête
+# Idempotency-Key : la transaction d'origine est renvoyée sans nouvelle écriture.
+# La clé est stockée sur la transaction (index unique sparse) et disparaît avec elle.
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+IDEMPOTENT_REPLAY_HEADER = "Idempotent-Replayed"
+
+
+async def replay_transaction(idempotency_key: str, transaction_data: TransactionCreate) -> Optional[Response]:
+    original = await db.transactions.find_one({"idempotency_key": idempotency_key}, TRANSACTION_FIELDS)
+    if not original:
+        return None
+    if any(original[field] != value for field, value in transaction_data.dict().items()):
+        raise HTTPException(
+            status_code=422,
+            detail=f"{IDEMPOTENCY_KEY_HEADER} déjà utilisée pour une autre transaction"
+        )
+    return ORJSONResponse(original, headers={IDEMPOTENT_REPLAY_HEADER: "true"})
+
+
+async def undo_transaction(document: dict):
+    await db.transactions.delete_one({"id": document["id"]})
+    await db.worker_balances.update_one(
+        {"_id": document["worker_id"]},
+        {"$inc": {ledger_field(document["type"]): -document["amount_cents"], "transaction_count": -1}}
+    )
+    # Entrée recréée par ledger_apply après la purge de l'ouvrier
+    await db.worker_balances.delete_one({"_id": document["worker_id"], "transaction_count": {"$lte": 0}})
+
+
 @api_router.post("/transactions", response_model=Transaction)
-async def create_transaction(transaction_data: TransactionCreate):
-    # Vérifier que l'ouvrier existe
-    worker = await db.workers.find_one({"id": transaction_data.worker_id})
-    if not worker:
-        raise HTTPException(status_code=404, detail="Ouvrier non trouvé")
+async def create_transaction(
+    transaction_data: TransactionCreate,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_KEY_HEADER, min_length=1, max_length=255)
+):
+    # Rejeu : ni vérification de l'ouvrier ni écriture
+    if idempotency_key:
+        replay = await replay_transaction(idempotency_key, transaction_data)
+        if replay:
+            return replay
     
     transaction = Transaction(**transaction_data.dict())
-    await db.transactions.insert_one(transaction.dict())
+    # Précision de MongoDB (ms) : un rejeu renvoie exactement la même réponse
+    transaction.date = transaction.date.replace(microsecond=transaction.date.microsecond // 1000 * 1000)
+    document = transaction_document(transaction.dict())
+    document["sync_at"] = datetime.utcnow()
+    if idempotency_key:
+        document["idempotency_key"] = idempotency_key
+    
+    async def write(session):
+        # Écriture conditionnelle sur l'ouvrier : dans une transaction MongoDB, elle
+        # entre en conflit avec une suppression concurrente et l'une des deux est rejouée
+        result = await db.workers.update_one(
+            {"id": transaction.worker_id, **ACTIVE_WORKERS},
+            {"$currentDate": {"last_write_at": True}},
+            session=session
+        )
+        if result.matched_count == 0:
+            raise HTTPException(status_code=404, detail="Ouvrier non trouvé")
+        await db.transactions.insert_one(document, session=session)
+        totals = await ledger_apply(
+            transaction.worker_id, transaction.type, document["amount_cents"], session=session
+        )
+        # Hors transaction : l'ouvrier a pu être supprimé, et sa purge passer, entre la
+        # vérification et l'insertion ; la transaction est alors retirée
+        if session is None and not await db.workers.find_one(
+            {"id": transaction.worker_id, **ACTIVE_WORKERS}, {"_id": 1}
+        ):
+            await undo_transaction(document)
+            raise HTTPException(status_code=404, detail="Ouvrier non trouvé")
+        return totals
+    
+    try:
+        totals = await run_write(write)
+    except DuplicateKeyError:
+        # Requête concurrente avec la même clé : elle a écrit la première
+        replay = await replay_transaction(idempotency_key, transaction_data) if idempotency_key else None
+        if not replay:
+            raise
+        return replay
+    await notify_change([transaction.worker_id], events=[("transaction_created", {
+        "transaction": transaction.dict(), **balance_event(transaction.worker_id, totals)
+    })])
     return transaction
 
 
+# Import en masse : le corps (CSV avec en-tête ou NDJSON) est lu en flux et
+# inséré par lots non ordonnés ; une ligne invalide n'interrompt pas l'import.
+BULK_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+MAX_CSV_RECORD_LINES = 100  # lignes d'un même enregistrement CSV (champ entre guillemets)
+BULK_FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+
+async def iter_body_lines(request: Request):
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in request.stream():
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+async def iter_import_rows(request: Request, import_format: str):
+    # Produit (numéro de ligne, ligne décodée, erreur de lecture) ; les lignes vides sont ignorées
+    if import_format == "csv":
+        async for row in iter_csv_rows(request):
+            yield row
+        return
+    line_number = 0
+    async for line in iter_body_lines(request):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"JSON invalide : {e}"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, "Objet JSON attendu"
+            continue
+        yield line_number, row, None
+
+
+async def iter_csv_rows(request: Request):
+    # Un enregistrement CSV peut couvrir plusieurs lignes (saut de ligne entre
+    # guillemets) : les lignes sont accumulées jusqu'à équilibrer les guillemets,
+    # et l'enregistrement porte le numéro de sa première ligne
+    header = None
+    record = []
+    first_line = line_number = 0
+    async for line in iter_body_lines(request):
+        line_number += 1
+        if not record:
+            if not line.strip():
+                continue
+            first_line = line_number
+        record.append(line)
+        text = "\n".join(record)
+        if text.count('"') % 2:
+            if len(record) < MAX_CSV_RECORD_LINES:
+                continue
+            record = []
+            yield first_line, None, f"Guillemet non fermé après {MAX_CSV_RECORD_LINES} lignes"
+            continue
+        record = []
+        try:
+            values = next(csv.reader([text]))
+        except csv.Error as e:
+            yield first_line, None, f"CSV invalide : {e}"
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+        else:
+            yield first_line, {name: value or None for name, value in zip(header, values)}, None
+    if record:
+        yield first_line, None, "Guillemet non fermé en fin de fichier"
+
+
+def format_validation_error(error: ValidationError) -> str:
+    first = error.errors()[0]
+    location = ".".join(str(part) for part in first["loc"])
+    return f"{location}: {first['msg']}" if location else first["msg"]
+
+
+@api_router.post("/transactions/bulk", response_model=BulkImportResult)
+async def import_transactions(request: Request, format: Optional[str] = Query(None, pattern="^(csv|ndjson)$")):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    import_format = format or BULK_FORMATS.get(content_type)
+    if not import_format:
+        raise HTTPException(status_code=415, detail="Format attendu : CSV ou NDJSON")
+    
+    # Une seule requête pour connaître les ouvriers existants
+    worker_ids = {worker["id"] async for worker in db.workers.find(ACTIVE_WORKERS, {"id": 1, "_id": 0})}
+    
+    inserted = 0
+    errors = []
+    error_count = 0
+    
+    def report(line_number: int, message: str):
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append(BulkImportError(line=line_number, error=message))
+    
+    async def flush(batch):
+        nonlocal inserted
+        docs = [doc for _, doc in batch]
+        synced_at = datetime.utcnow()
+        for doc in docs:
+            doc["sync_at"] = synced_at
+        failed = set()
+        try:
+            await db.transactions.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for write_error in e.details["writeErrors"]:
+                failed.add(write_error["index"])
+                report(batch[write_error["index"]][0], write_error["errmsg"])
+        written = [doc for index, doc in enumerate(docs) if index not in failed]
+        await ledger_apply_many(written)
+        await checkpoints_apply(written, +1)
+        worker_ids = list({doc["worker_id"] for doc in written})
+        events = []
+        if events_wanted():
+            events = [
+                ("balance_changed", balance_event(worker_id, totals))
+                for worker_id, totals in (await ledger_totals(worker_ids)).items()
+            ]
+        await notify_change(worker_ids, events=events, reports=touches_closed_periods(written))
+        inserted += len(written)
+    
+    batch = []
+    async for line_number, row, read_error in iter_import_rows(request, import_format):
+        if read_error:
+            report(line_number, read_error)
+            continue
+        try:
+            data = TransactionImport(**row)
+        except ValidationError as e:
+            report(line_number, format_validation_error(e))
+            continue
+        if data.worker_id not in worker_ids:
+            report(line_number, "Ouvrier non trouvé")
+            continue
+        transaction = Transaction(**data.dict(exclude_none=True))
+        batch.append((line_number, transaction_document(transaction.dict())))
+        if len(batch) >= BULK_BATCH_SIZE:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+    
+    return BulkImportResult(inserted=inserted, error_count=error_count, errors=errors)
+
+
 @api_router.get("/transactions", response_model=List[Transaction])
-async def get_transactions():
-    transactions = await db.transactions.find().sort("date", -1).to_list(1000)
-    return [Transaction(**transaction) for transaction in transactions]
+async def get_transactions(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include_archive: bool = False
+):
+    async def respond():
+        transactions, next_cursor = await paginate_history({}, limit, cursor, include_archive)
+        return page_response(transactions, next_cursor)
+    
+    return await versioned_response(request, ("transactions",), respond)
 
 
 @api_router.get("/workers/{worker_id}/transactions", response_model=List[Transaction])
-async def get_worker_transactions(worker_id: str):
-    transactions = await db.transactions.find({"worker_id": worker_id}).sort("date", -1).to_list(1000)
-    return [Transaction(**transaction) for transaction in transactions]
+async def get_worker_transactions(
+    worker_id: str,
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include_archive: bool = False
+):
+    async def respond():
+        transactions, next_cursor = await paginate_history({"worker_id": worker_id}, limit, cursor, include_archive)
+        return page_response(transactions, next_cursor)
+    
+    return await versioned_response(request, ("transactions",), respond)
+
+
+# Balance helpers
+# Construisent directement les dictionnaires de WorkerSummary / WorkerBalance
+def build_worker_summary(worker: dict, totals: dict) -> dict:
+    return {"worker": worker, **public_totals(totals)}
+
+
+def build_worker_balance(
+    worker: dict,
+    totals: dict,
+    transactions: List[dict],
+    transactions_next_cursor: Optional[str] = None
+) -> dict:
+    return {
+        **build_worker_summary(worker, totals),
+        "transactions": transactions,
+        "transactions_next_cursor": transactions_next_cursor,
+    }
 
 
 # Balance calculation endpoint
 @api_router.get("/workers/{worker_id}/balance", response_model=WorkerBalance)
-async def get_worker_balance(worker_id: str):
-    # Récupérer l'ouvrier
-    worker_data = await db.workers.find_one({"id": worker_id})
-    if not worker_data:
-        raise HTTPException(status_code=404, detail="Ouvrier non trouvé")
-    
-    worker = Worker(**worker_data)
-    
-    # Récupérer toutes les transactions de l'ouvrier
-    transactions_data = await db.transactions.find({"worker_id": worker_id}).sort("date", -1).to_list(1000)
-    transactions = [Transaction(**t) for t in transactions_data]
-    
-    # Calculer les totaux
-    total_due = sum(t.amount for t in transactions if t.type == TransactionType.DUE)
-    total_paid = sum(t.amount for t in transactions if t.type == TransactionType.PAID)
-    balance = total_due - total_paid
+async def get_worker_balance(
+    worker_id: str,
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    as_of: Optional[datetime] = None,
+    include_archive: bool = False
+):
+    async def compute():
+        # Récupérer l'ouvrier
+        worker = await db.workers.find_one({"id": worker_id, **ACTIVE_WORKERS}, WORKER_FIELDS)
+        if not worker:
+            raise HTTPException(status_code=404, detail="Ouvrier non trouvé")
+        
+        # Les totaux viennent du ledger, sans re-sommer l'historique ;
+        # à une date passée, du dernier checkpoint et des transactions suivantes
+        query = {"worker_id": worker_id}
+        if as_of:
+            totals = await totals_as_of(worker_id, as_of)
+            query["date"] = {"$lt": as_of}
+        else:
+            totals = (await ledger_totals([worker_id]))[worker_id]
+        
+        # Récupérer une page de l'historique de l'ouvrier
+        transactions, next_cursor = await paginate_history(query, limit, cursor, include_archive)
+        
+        return build_worker_balance(worker, totals, transactions, next_cursor), None
     
-    return WorkerBalance(
-        worker=worker,
-        total_due=total_due,
-        total_paid=total_paid,
-        balance=balance,
-        transactions=transactions
-    )
+    return await cached_json(request, worker_id, compute)
 
 
 # Get all workers with their balances
 @api_router.get("/workers-balances", response_model=List[WorkerBalance])
-async def get_all_workers_balances():
-    workers = await db.workers.find().to_list(1000)
-    balances = []
-    
-    for worker_data in workers:
-        worker = Worker(**worker_data)
+async def get_all_workers_balances(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    transactions_limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
+    async def compute():
+        # Une seule agrégation : une page d'ouvriers, chacun avec la première page
+        # de son historique ($lookup avec localField + pipeline, MongoDB >= 5.0)
+        pipeline = [
+            {"$match": keyset_query(ACTIVE_WORKERS, "created_at", False, cursor)},
+            {"$sort": dict(keyset_sort("created_at", False))},
+            {"$limit": limit + 1},
+            {"$project": WORKER_FIELDS},
+            {"$lookup": {
+                "from": "transactions",
+                "localField": "id",
+                "foreignField": "worker_id",
+                "pipeline": [
+                    {"$sort": dict(keyset_sort("date", True))},
+                    {"$limit": transactions_limit + 1},
+                    {"$project": TRANSACTION_FIELDS},
+                ],
+                "as": "transactions",
+            }},
+        ]
+        workers, next_cursor = split_page(
+            await db.workers.aggregate(pipeline).to_list(None), "created_at", limit
+        )
+        totals = await ledger_totals([worker_data["id"] for worker_data in workers])
         
-        # Récupérer les transactions de chaque ouvrier
-        transactions_data = await db.transactions.find({"worker_id": worker.id}).sort("date", -1).to_list(1000)
-        transactions = [Transaction(**t) for t in transactions_data]
+        balances = []
+        for worker_data in workers:
+            transactions_data, transactions_cursor = split_page(
+                worker_data.pop("transactions"), "date", transactions_limit
+            )
+            balances.append(build_worker_balance(
+                worker_data, totals[worker_data["id"]], transactions_data, transactions_cursor
+            ))
         
-        # Calculer les totaux
-        total_due = sum(t.amount for t in transactions if t.type == TransactionType.DUE)
-        total_paid = sum(t.amount for t in transactions if t.type == TransactionType.PAID)
-        balance = total_due - total_paid
-        
-        balances.append(WorkerBalance(
-            worker=worker,
-            total_due=total_due,
-            total_paid=total_paid,
-            balance=balance,
-            transactions=transactions
-        ))
+        return balances, next_cursor
+    
+    return await cached_json(request, ALL_WORKERS, compute)
+
+
+# Workers with their totals only: the history is loaded per worker on demand
+@api_router.get("/workers-summary", response_model=List[WorkerSummary])
+async def get_workers_summary(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    async def compute():
+        workers, next_cursor = await paginate(
+            db.workers, ACTIVE_WORKERS, "created_at", False, limit, cursor, WORKER_FIELDS
+        )
+        totals = await ledger_totals([worker_data["id"] for worker_data in workers])
+        summaries = [
+            build_worker_summary(worker_data, totals[worker_data["id"]])
+            for worker_data in workers
+        ]
+        return summaries, next_cursor
+    
+    return await cached_json(request, ALL_WORKERS, compute)
+
+
+# Balances of many workers in one call; unknown ids are reported per item
+@api_router.post("/balances:batch", response_model=List[BalanceBatchItem])
+async def get_balances_batch(batch: BalanceBatchRequest):
+    if len(batch.worker_ids) > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"{MAX_PAGE_SIZE} ouvriers maximum par requête")
+    
+    worker_ids = list(dict.fromkeys(batch.worker_ids))
+    workers = {
+        worker_data["id"]: worker_data
+        async for worker_data in db.workers.find({"id": {"$in": worker_ids}, **ACTIVE_WORKERS}, WORKER_FIELDS)
+    }
+    totals = await ledger_totals(list(workers))
     
-    return balances
+    return ORJSONResponse([
+        {"worker_id": worker_id, "balance": build_worker_summary(workers[worker_id], totals[worker_id]), "error": None}
+        if worker_id in workers
+        else {"worker_id": worker_id, "balance": None, "error": "Ouvrier non trouvé"}
+        for worker_id in batch.worker_ids
+    ])
 
 
-@api_router.delete("/workers/{worker_id}")
+@api_router.delete("/workers/{worker_id}", status_code=202)
 async def delete_worker(worker_id: str):
-    # Supprimer l'ouvrier
-    result = await db.workers.delete_one({"id": worker_id})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Ouvrier non trouvé")
+    # Suppression logique immédiate ; la purge des transactions part en tâche de fond
+    async def write(session):
+        result = await db.workers.update_one(
+            {"id": worker_id, **ACTIVE_WORKERS}, {"$set": {"deleted_at": datetime.utcnow()}}, session=session
+        )
+        if result.matched_count == 0:
+            raise HTTPException(status_code=404, detail="Ouvrier non trouvé")
+        await record_tombstone("worker", worker_id, worker_id, session=session)
     
-    # Supprimer toutes les transactions de cet ouvrier
-    await db.transactions.delete_many({"worker_id": worker_id})
+    await run_write(write)
+    await notify_change(
+        [worker_id], events=[("worker_deleted", {"worker_id": worker_id})], reports=True,
+        collections=("workers", "transactions")
+    )
+    job = await job_queue.submit("purge_worker", worker_id=worker_id)
     
-    return {"message": "Ouvrier et ses transactions supprimés avec succès"}
+    return {"message": "Ouvrier supprimé, purge de ses transactions en cours", "job_id": job["id"]}
 
 
 @api_router.delete("/transactions/{transaction_id}")
 async def delete_transaction(transaction_id: str):
-    result = await db.transactions.delete_one({"id": transaction_id})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Transaction non trouvée")
+    transaction = await db.transactions.find_one_and_delete({"id": transaction_id})
+    if not transaction:
+        transaction = await db.transactions_archive.find_one_and_delete({"id": transaction_id})
+        if not transaction:
+            raise HTTPException(status_code=404, detail="Transaction non trouvée")
+        # Retirer aussi le montant des totaux reportés de l'archive
+        await db.archive_totals.update_one(
+            {"_id": transaction["worker_id"]},
+            {"$inc": {ledger_field(transaction["type"]): -transaction["amount_cents"], "transaction_count": -1}}
+        )
+    
+    await record_tombstone("transaction", transaction_id, transaction["worker_id"])
+    
+    # Retirer le montant du ledger
+    totals = await ledger_apply(transaction["worker_id"], transaction["type"], -transaction["amount_cents"], count=-1)
+    await checkpoints_apply([transaction], -1)
+    await notify_change([transaction["worker_id"]], events=[("transaction_deleted", {
+        "transaction_id": transaction_id, **balance_event(transaction["worker_id"], totals)
+    })], reports=touches_closed_periods([transaction]))
     
     return {"message": "Transaction supprimée avec succès"}
 
 
+# Background jobs
+# Exécutées dans le processus par JOB_CONCURRENCY tâches asyncio ; l'état est
+# conservé dans db.jobs (supprimé JOB_RETENTION_DAYS après la fin de la tâche).
+PURGE_BATCH_SIZE = 1000
+MAX_REPORTED_DRIFTS = 100
+
+
+@job_queue.handler("purge_worker")
+async def purge_worker(worker_id: str) -> dict:
+    # Par lots, pour ne pas monopoliser MongoDB sur un long historique
+    deleted = 0
+    for collection in history_collections():
+        while True:
+            ids = [
+                transaction["id"]
+                async for transaction in collection.find({"worker_id": worker_id}, {"_id": 0, "id": 1})
+                .limit(PURGE_BATCH_SIZE)
+            ]
+            if not ids:
+                break
+            deleted += (await collection.delete_many({"id": {"$in": ids}})).deleted_count
+    
+    await db.worker_balances.delete_one({"_id": worker_id})
+    await db.archive_totals.delete_one({"_id": worker_id})
+    await db.balance_checkpoints.delete_many({"worker_id": worker_id})
+    await db.workers.delete_one({"id": worker_id, "deleted_at": {"$ne": None}})
+    await notify_change()
+    return {"transactions_deleted": deleted}
+
+
+@job_queue.handler("reconcile_ledger")
+async def reconcile_ledger_job(dry_run: bool = False) -> dict:
+    drifts = await reconcile_ledger(dry_run=dry_run)
+    return {"drift_count": len(drifts), "drifts": drifts[:MAX_REPORTED_DRIFTS]}
+
+
+@job_queue.handler("archive_transactions")
+async def archive_transactions_job() -> dict:
+    return await archive_transactions()
+
+
+@api_router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Tâche non trouvée")
+    return job
+
+
+async def check_ledger_lock():
+    # La tâche échouerait aussi (LedgerBusy) : refus immédiat plutôt qu'une tâche en échec
+    holder = await ledger_lock_holder()
+    if holder:
+        raise HTTPException(status_code=409, detail=f"Opération en cours sur les soldes : {holder['operation']}")
+
+
+@api_router.post("/admin/reconcile", status_code=202)
+async def start_reconcile(dry_run: bool = False):
+    await check_ledger_lock()
+    return await job_queue.submit("reconcile_ledger", dry_run=dry_run)
+
+
+@api_router.post("/admin/archive", status_code=202)
+async def start_archive():
+    await check_ledger_lock()
+    return await job_queue.submit("archive_transactions")
+
+
+# Live updates
+# Événements : worker_created, worker_deleted, transaction_created,
+# transaction_deleted, balance_changed (import en masse) et resync.
+@api_router.get("/events")
+async def stream_events():
+    async def messages():
+        queue = event_hub.subscribe()
+        try:
+            yield f"retry: {SSE_HEARTBEAT_SECONDS * 1000}\n\n"
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            event_hub.unsubscribe(queue)
+    
+    return StreamingResponse(
+        messages(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# Delta sync
+# Les ouvriers et transactions portent sync_at, la date de leur écriture ; les
+# suppressions laissent une tombe (db.sync_tombstones), retirée après
+# SYNC_TOMBSTONE_DAYS jours : un jeton antérieur à la dernière tombe retirée reçoit
+# un 410 et le client recharge tout. /api/sync?since=<token> renvoie les éléments écrits depuis le jeton, par
+# (sync_at, id) croissants, et le jeton suivant. Tant que has_more est vrai, le
+# jeton poursuit la lecture ; le dernier jeton relit ensuite les SYNC_OVERLAP_SECONDS
+# précédentes pour rattraper une écriture horodatée avant d'être visible : le client
+# applique chaque élément par id, un doublon est sans effet. Sans changement, la
+# réponse est identique et If-None-Match donne un 304.
+SYNC_TOMBSTONE_DAYS = int(os.environ.get("SYNC_TOMBSTONE_DAYS", "30"))
+SYNC_OVERLAP_SECONDS = float(os.environ.get("SYNC_OVERLAP_SECONDS", "5"))
+SYNC_EPOCH = datetime(1970, 1, 1)
+SYNC_STATE_ID = "sync_tombstones"
+
+
+async def record_tombstone(kind: str, item_id: str, worker_id: str, session=None):
+    now = datetime.utcnow()
+    await db.sync_tombstones.insert_one(
+        {"type": kind, "id": item_id, "worker_id": worker_id, "sync_at": now}, session=session
+    )
+    # Les tombes expirées sont retirées à chaque suppression ; la date de la plus
+    # récente d'entre elles est enregistrée avant de les retirer
+    expired = await db.sync_tombstones.find_one(
+        {"sync_at": {"$lt": now - timedelta(days=SYNC_TOMBSTONE_DAYS)}},
+        sort=[("sync_at", DESCENDING)],
+        session=session
+    )
+    if expired:
+        await db.sync_state.update_one(
+            {"_id": SYNC_STATE_ID}, {"$max": {"pruned_through": expired["sync_at"]}}, upsert=True, session=session
+        )
+        await db.sync_tombstones.delete_many({"sync_at": {"$lte": expired["sync_at"]}}, session=session)
+
+
+def encode_sync_token(sync_at: datetime, last_id: str, more: bool) -> str:
+    payload = json.dumps([sync_at.isoformat(), last_id, more])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_sync_token(token: str):
+    try:
+        sync_at, last_id, more = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return datetime.fromisoformat(sync_at), str(last_id), bool(more)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Jeton de synchronisation invalide")
+
+
+async def backfill_sync() -> int:
+    # Documents écrits avant sync_at : renvoyés une fois, à la première synchronisation
+    updated = 0
+    for collection in (db.workers, db.transactions):
+        result = await collection.update_many({"sync_at": {"$exists": False}}, {"$set": {"sync_at": SYNC_EPOCH}})
+        updated += result.modified_count
+    if updated:
+        # Listes déjà servies sans ces documents : nouvel ETag
+        await bump_versions(("workers", "transactions"))
+    return updated
+
+
+@api_router.get("/sync", response_model=SyncResponse)
+async def sync(
+    request: Request,
+    since: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
+    if since:
+        last_at, last_id, more = decode_sync_token(since)
+        state = await db.sync_state.find_one({"_id": SYNC_STATE_ID})
+        if state and last_at <= state["pruned_through"]:
+            # Des suppressions postérieures au jeton ont pu être oubliées
+            raise HTTPException(status_code=410, detail="Jeton expiré, synchronisation complète nécessaire")
+        if more:
+            query = keyset_after({}, "sync_at", False, last_at, last_id)
+        else:
+            query = {"sync_at": {"$gte": last_at - timedelta(seconds=SYNC_OVERLAP_SECONDS)}}
+    else:
+        query, last_at, last_id = {"sync_at": {"$gte": SYNC_EPOCH}}, SYNC_EPOCH, ""
+    
+    sources = (
+        ("workers", db.workers, {**WORKER_FIELDS, "sync_at": 1}, ACTIVE_WORKERS),
+        ("transactions", db.transactions, {**TRANSACTION_FIELDS, "sync_at": 1}, {}),
+        ("deleted", db.sync_tombstones, {"_id": 0}, {}),
+    )
+    pages = await asyncio.gather(*(
+        collection.find({**query, **active}, projection)
+        .sort(keyset_sort("sync_at", False))
+        .to_list(limit + 1)
+        for _, collection, projection, active in sources
+    ))
+    # Fusion des trois flux sur (sync_at, id), limit éléments au total
+    items = sorted(
+        ((doc["sync_at"], doc["id"], name, doc) for (name, *_), page in zip(sources, pages) for doc in page),
+        key=lambda item: item[:2]
+    )
+    has_more = len(items) > limit
+    items = items[:limit]
+    if items:
+        last_at, last_id = items[-1][0], items[-1][1]
+    
+    content = {name: [] for name, *_ in sources}
+    for _, _, name, doc in items:
+        del doc["sync_at"]
+        content[name].append(doc)
+    # Soldes des ouvriers touchés, sauf ceux supprimés
+    deleted_workers = {doc["id"] for doc in content["deleted"] if doc["type"] == "worker"}
+    worker_ids = sorted(
+        ({doc["id"] for doc in content["workers"]} | {doc["worker_id"] for doc in content["transactions"]}
+         | {doc["worker_id"] for doc in content["deleted"]}) - deleted_workers
+    )
+    content["balances"] = [
+        balance_event(worker_id, totals) for worker_id, totals in (await ledger_totals(worker_ids)).items()
+    ]
+    content["token"] = encode_sync_token(last_at, last_id, has_more)
+    content["has_more"] = has_more
+    
+    body = orjson.dumps(content)
+    headers = {"ETag": f'"{hashlib.sha1(body).hexdigest()}"'}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+# Export endpoints
+# Les curseurs Motor sont parcourus par lots et chaque lot est sérialisé puis
+# envoyé aussitôt : la mémoire utilisée ne dépend pas de la taille des collections.
+EXPORT_BATCH_SIZE = 1000
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+TRANSACTION_EXPORT_FIELDS = ["id", "worker_id", "type", "amount", "description", "date"]
+BALANCE_EXPORT_FIELDS = [
+    "worker_id", "name", "position", "phone",
+    "total_due", "total_paid", "balance", "transaction_count",
+]
+
+
+def date_range_query(from_date: Optional[datetime], to_date: Optional[datetime]) -> dict:
+    # Intervalle semi-ouvert [from, to)
+    date_filter = {}
+    if from_date:
+        date_filter["$gte"] = from_date
+    if to_date:
+        date_filter["$lt"] = to_date
+    return {"date": date_filter} if date_filter else {}
+
+
+def export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def serialize_rows(rows: List[dict], fields: List[str], export_format: str, header: bool = False) -> str:
+    if export_format == "ndjson":
+        return "".join(
+            json.dumps({field: export_value(row.get(field)) for field in fields}) + "\n"
+            for row in rows
+        )
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(fields)
+    writer.writerows([export_value(row.get(field)) for field in fields] for row in rows)
+    return buffer.getvalue()
+
+
+async def iter_batches(cursor, batch_size: int = EXPORT_BATCH_SIZE):
+    batch = []
+    async for doc in cursor.batch_size(batch_size):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def export_response(chunks, export_format: str, name: str) -> StreamingResponse:
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{export_format}"'}
+    )
+
+
+@api_router.get("/export/transactions")
+async def export_transactions(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    worker_id: Optional[str] = None,
+    from_date: Optional[datetime] = Query(None, alias="from"),
+    to_date: Optional[datetime] = Query(None, alias="to"),
+    include_archive: bool = False
+):
+    query = date_range_query(from_date, to_date)
+    if worker_id:
+        query["worker_id"] = worker_id
+    
+    async def chunks():
+        if format == "csv":
+            yield serialize_rows([], TRANSACTION_EXPORT_FIELDS, format, header=True)
+        # L'archive, plus ancienne, est exportée à la suite des transactions actives
+        for collection in history_collections(include_archive):
+            cursor = collection.find(query, TRANSACTION_FIELDS).sort(keyset_sort("date", True))
+            async for batch in iter_batches(cursor):
+                yield serialize_rows(batch, TRANSACTION_EXPORT_FIELDS, format)
+    
+    return export_response(chunks(), format, "transactions")
+
+
+async def range_totals(worker_ids: List[str], from_date: Optional[datetime], to_date: Optional[datetime]) -> dict:
+    # Totaux limités à une période, calculés sur les transactions
+    totals = {worker_id: ledger_entry() for worker_id in worker_ids}
+    pipeline = [
+        {"$match": {"worker_id": {"$in": worker_ids}, **date_range_query(from_date, to_date)}},
+        totals_group_stage(),
+    ]
+    async for row in aggregate_history(pipeline):
+        totals[row["_id"]] = add_totals(totals[row["_id"]], ledger_entry(row))
+    return totals
+
+
+@api_router.get("/export/balances")
+async def export_balances(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    worker_id: Optional[str] = None,
+    from_date: Optional[datetime] = Query(None, alias="from"),
+    to_date: Optional[datetime] = Query(None, alias="to")
+):
+    query = {"id": worker_id, **ACTIVE_WORKERS} if worker_id else ACTIVE_WORKERS
+    
+    async def chunks():
+        if format == "csv":
+            yield serialize_rows([], BALANCE_EXPORT_FIELDS, format, header=True)
+        cursor = db.workers.find(query, {"_id": 0}).sort(keyset_sort("created_at", False))
+        async for workers in iter_batches(cursor):
+            worker_ids = [worker["id"] for worker in workers]
+            # Sans période, les totaux viennent directement du ledger
+            if from_date or to_date:
+                totals = await range_totals(worker_ids, from_date, to_date)
+            else:
+                totals = await ledger_totals(worker_ids)
+            rows = []
+            for worker in workers:
+                rows.append({
+                    "worker_id": worker["id"],
+                    "name": worker["name"],
+                    "position": worker.get("position"),
+                    "phone": worker.get("phone"),
+                    **public_totals(totals[worker["id"]]),
+                })
+            yield serialize_rows(rows, BALANCE_EXPORT_FIELDS, format)
+    
+    return export_response(chunks(), format, "balances")
+
+
+# Reports
+# Totaux dus/payés par période (jour, semaine du lundi, mois UTC) et par ouvrier
+# ou par poste. Les périodes closes ne changent plus qu'à l'import ou à la
+# suppression d'une transaction antérieure à aujourd'hui : leur résultat est
+# mis en cache et seule la période en cours est recalculée à chaque requête.
+REPORT_GROUPS = ("worker", "position")
+report_cache = BalanceCache(
+    ttl=float(os.environ.get("REPORT_CACHE_TTL", "3600")),
+    max_entries=int(os.environ.get("REPORT_CACHE_MAX_ENTRIES", "1000"))
+)
+
+
+def touches_closed_periods(transactions: List[dict]) -> bool:
+    closed_before = period_start(datetime.utcnow(), "day")
+    return any(transaction["date"] < closed_before for transaction in transactions)
+
+
+def utc_naive(moment: Optional[datetime]) -> Optional[datetime]:
+    # Les dates sont stockées en UTC sans fuseau
+    if moment and moment.tzinfo:
+        return moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+async def period_totals(
+    group_by: str,
+    period: str,
+    worker_id: Optional[str],
+    from_date: Optional[datetime],
+    to_date: Optional[datetime]
+) -> List[dict]:
+    # Regroupement par (ouvrier, période) dans MongoDB ; les postes sont résolus
+    # ensuite sur ce résultat réduit, sans $lookup par transaction
+    match = date_range_query(from_date, to_date)
+    if worker_id:
+        match["worker_id"] = worker_id
+    pipeline = [
+        {"$match": match},
+        totals_group_stage({"worker_id": "$worker_id", "period": date_trunc(period)}),
+    ]
+    buckets = [
+        (row["_id"]["worker_id"], row["_id"]["period"], ledger_entry(row))
+        async for row in aggregate_history(pipeline)
+    ]
+    workers = {
+        worker["id"]: worker
+        async for worker in db.workers.find(
+            {"id": {"$in": list({bucket[0] for bucket in buckets})}, **ACTIVE_WORKERS},
+            {"_id": 0, "id": 1, "name": 1, "position": 1}
+        )
+    }
+    
+    grouped = {}
+    for bucket_worker_id, bucket_period, totals in buckets:
+        worker = workers.get(bucket_worker_id)
+        if worker is None:
+            continue  # ouvrier supprimé, transactions en attente de purge
+        if group_by == "worker":
+            key = (bucket_period, bucket_worker_id)
+            labels = {"worker_id": bucket_worker_id, "name": worker.get("name"), "position": worker.get("position")}
+        else:
+            key = (bucket_period, worker.get("position") or "")
+            labels = {"position": worker.get("position")}
+        row_labels, row_totals = grouped.setdefault(key, ({"period": bucket_period, **labels}, ledger_entry()))
+        for field, value in totals.items():
+            row_totals[field] += value
+    
+    return [{**grouped[key][0], **public_totals(grouped[key][1])} for key in sorted(grouped)]
+
+
+@api_router.get("/reports/totals", response_model=List[PeriodTotals])
+async def get_report_totals(
+    group_by: str = Query("worker", pattern="^(worker|position)$"),
+    period: str = Query("month", pattern="^(day|week|month)$"),
+    worker_id: Optional[str] = None,
+    from_date: Optional[datetime] = Query(None, alias="from"),
+    to_date: Optional[datetime] = Query(None, alias="to")
+):
+    from_date, to_date = utc_naive(from_date), utc_naive(to_date)
+    current_start = period_start(datetime.utcnow(), period)
+    
+    # Partie close [from, début de la période en cours) : servie par le cache
+    rows = []
+    closed_end = min(to_date, current_start) if to_date else current_start
+    if not from_date or from_date < closed_end:
+        key = f"{group_by}:{period}:{worker_id}:{from_date}:{closed_end}"
+        closed = report_cache.get(ALL_WORKERS, key)
+        if closed is None:
+            generation = report_cache.generation(ALL_WORKERS)
+            closed = await period_totals(group_by, period, worker_id, from_date, closed_end)
+            report_cache.set(ALL_WORKERS, key, closed, generation)
+        rows.extend(closed)
+    
+    # Période en cours (et suivantes) : toujours recalculée
+    if not to_date or to_date > current_start:
+        open_start = max(from_date, current_start) if from_date else current_start
+        rows.extend(await period_totals(group_by, period, worker_id, open_start, to_date))
+    
+    return ORJSONResponse(rows)
+
+
+# Admin endpoints
+@api_router.get("/admin/index-stats")
+async def get_index_stats():
+    # Utilisation de chaque index depuis le dernier redémarrage de mongod
+    stats = {}
+    for collection_name in INDEXES:
+        stats[collection_name] = [
+            {
+                "name": index["name"],
+                "key": index["key"],
+                "ops": index["accesses"]["ops"],
+                "since": index["accesses"]["since"],
+            }
+            async for index in db[collection_name].aggregate([{"$indexStats": {}}])
+        ]
+    return stats
+
+
+@api_router.get("/admin/cache-stats")
+async def get_cache_stats():
+    return balance_cache.stats()
+
+
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    cache_stats = balance_cache.stats()
+    report_stats = report_cache.stats()
+    pool_stats = pool_monitor.stats()
+    limiter_stats = request_limiter.stats()
+    gauges = {
+        "balance_cache_entries": ("gauge", "Entrées du cache des soldes", cache_stats["entries"]),
+        "balance_cache_hits_total": ("counter", "Lectures servies par le cache", cache_stats["hits"]),
+        "balance_cache_misses_total": ("counter", "Lectures recalculées", cache_stats["misses"]),
+        "balance_cache_not_modified_total": ("counter", "Réponses 304", cache_stats["not_modified"]),
+        "balance_cache_invalidations_total": ("counter", "Invalidations du cache", cache_stats["invalidations"]),
+        "report_cache_hits_total": ("counter", "Périodes closes servies par le cache", report_stats["hits"]),
+        "report_cache_misses_total": ("counter", "Périodes closes recalculées", report_stats["misses"]),
+        "mongodb_pool_max_size": ("gauge", "Taille maximale du pool MongoDB", MONGO_OPTIONS["maxPoolSize"]),
+        "mongodb_pool_connections": ("gauge", "Connexions MongoDB ouvertes", pool_stats["open"]),
+        "mongodb_pool_in_use": ("gauge", "Connexions MongoDB utilisées", pool_stats["in_use"]),
+        "mongodb_pool_waiting": ("gauge", "Requêtes en attente d'une connexion", pool_stats["waiting"]),
+        "mongodb_pool_wait_failures_total": ("counter", "Attentes de connexion expirées", pool_stats["wait_failures"]),
+        "http_requests_admitted": ("gauge", "Requêtes admises en cours d'exécution", limiter_stats["in_flight"]),
+        "http_requests_queued": ("gauge", "Requêtes en attente d'admission", limiter_stats["waiting"]),
+    }
+    return PlainTextResponse(
+        metrics_registry.render(db_monitor, gauges),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
 # Health check
 @api_router.get("/")
 async def root():
     return {"message": "API de gestion des paies des ouvriers"}
 
 
+@api_router.get("/health")
+async def health():
+    # Exclu du délestage : reste disponible quand le pool est saturé
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(db.command("ping"), timeout=HEALTH_PING_TIMEOUT)
+        database = {"ok": True, "ping_ms": round((time.perf_counter() - start) * 1000, 2)}
+    except (ConnectionFailure, asyncio.TimeoutError) as e:
+        database = {"ok": False, "error": str(e) or "ping expiré"}
+    
+    pool = pool_monitor.stats()
+    content = {
+        "status": "ok" if database["ok"] else "unavailable",
+        "database": database,
+        "pool": {
+            "max_size": MONGO_OPTIONS["maxPoolSize"],
+            "occupancy": round(pool["in_use"] / MONGO_OPTIONS["maxPoolSize"], 3),
+            **pool,
+        },
+        "load_shedding": {
+            "max_waiting": MONGO_MAX_WAITING,
+            "shed": metrics_registry.shed_requests,
+            **request_limiter.stats(),
+        },
+    }
+    return ORJSONResponse(content, status_code=200 if database["ok"] else 503)
+
+
 # Include the router in the main app
 app.include_router(api_router)
 
+# Ajouté avant CORS : les 503 du délestage portent aussi les en-têtes CORS
+app.add_middleware(
+    LoadSheddingMiddleware,
+    registry=metrics_registry,
+    pool_monitor=pool_monitor,
+    limiter=request_limiter,
+    max_waiting=MONGO_MAX_WAITING,
+    retry_after=RETRY_AFTER_SECONDS,
+    # /api/events : flux de longue durée, sans travail MongoDB
+    exempt_paths=("/api/health", "/api/metrics", "/api/events"),
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", IDEMPOTENT_REPLAY_HEADER],
+)
+
+# Compression : ajoutée après CORS et avant les métriques, qui mesurent ainsi les
+# octets réellement envoyés
+COMPRESSION_ENCODINGS = [
+    encoding.strip() for encoding in os.environ.get("COMPRESSION_ENCODINGS", "br,gzip").split(",") if encoding.strip()
+]
+if COMPRESSION_ENCODINGS:
+    app.add_middleware(
+        CompressionMiddleware,
+        encodings=COMPRESSION_ENCODINGS,
+        minimum_size=int(os.environ.get("COMPRESSION_MIN_SIZE", "1024")),
+        gzip_level=int(os.environ.get("GZIP_LEVEL", "6")),
+        brotli_quality=int(os.environ.get("BROTLI_QUALITY", "4")),
+    )
+
+app.add_middleware(
+    MetricsMiddleware,
+    registry=metrics_registry,
+    slow_request_seconds=float(SLOW_REQUEST_MS) / 1000 if SLOW_REQUEST_MS else None,
 )
 
 # Configure logging
@@ -220,7 +2375,3 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
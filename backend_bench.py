@@ -0,0 +1,841 @@
+#!/usr/bin/env python3
+"""
+Backend Performance Benchmarks for Payroll Management System
+Runs the API in-process against a seeded MongoDB database (or a mongomock stand-in)
+and measures throughput, p50/p99 latency and DB round trips per endpoint.
+
+Examples:
+    python backend_bench.py --workers 1000 --transactions 20 --concurrency 20 --output run.json
+    python backend_bench.py --mock --requests 100
+    python backend_bench.py --compare baseline.json --output run.json
+    python backend_bench.py --scenarios workers-balances query-plans
+    python backend_bench.py --scenarios serialization --workers 1000 --transactions 50
+    python backend_bench.py --scenarios money --workers 1000 --transactions 100
+    python backend_bench.py --scenarios concurrent-writes --write-modes off on --requests 5000 --concurrency 64
+    python backend_bench.py --scenarios scaling --processes 1 2 4 --requests 5000 --concurrency 64
+    python backend_bench.py --scenarios compression --workers 5000 --transactions 5 --link-mbps 10
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import orjson
+from pydantic import TypeAdapter
+from pymongo import monitoring
+
+BACKEND_DIR = Path(__file__).parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Base dédiée aux benchmarks : ne jamais écraser les données de l'application
+os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "payroll_bench")
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Compte les commandes envoyées à MongoDB (un aller-retour par commande)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+COMMANDS = CommandCounter()
+# Le listener doit être enregistré avant la création du client Motor dans server.py
+monitoring.register(COMMANDS)
+
+import httpx  # noqa: E402
+import server  # noqa: E402
+
+
+def print_header(title):
+    print(f"\n{'='*60}")
+    print(f"BENCHMARK: {title}")
+    print(f"{'='*60}")
+
+
+async def seed(workers_count, transactions_per_worker):
+    """Recrée le jeu de données : workers_count ouvriers, transactions_per_worker chacun"""
+    db = server.db
+    await db.workers.delete_many({})
+    await db.transactions.delete_many({})
+    await db.worker_balances.delete_many({})
+
+    now = datetime.utcnow()
+    workers = [
+        {
+            "id": str(uuid.uuid4()),
+            "name": f"Ouvrier {i}",
+            "position": "Maçon" if i % 2 else "Électricienne",
+            "phone": None,
+            "created_at": now,
+        }
+        for i in range(workers_count)
+    ]
+    await db.workers.insert_many([
+        {**worker, **server.worker_search_fields(worker), "sync_at": now - timedelta(days=1, seconds=i)}
+        for i, worker in enumerate(workers)
+    ])
+
+    batch = []
+    for worker in workers:
+        for j in range(transactions_per_worker):
+            batch.append({
+                "id": str(uuid.uuid4()),
+                "worker_id": worker["id"],
+                "type": "due" if j % 2 == 0 else "paid",
+                "amount_cents": 10000 if j % 2 == 0 else 4000,
+                "description": None,
+                "date": now - timedelta(days=j),
+                # Écritures étalées dans le temps, comme en production
+                "sync_at": now - timedelta(seconds=len(batch)),
+            })
+            if len(batch) >= 10000:
+                await db.transactions.insert_many(batch)
+                batch = []
+    if batch:
+        await db.transactions.insert_many(batch)
+    await server.reconcile_ledger()
+    await server.ensure_indexes()
+
+
+async def legacy_workers_balances():
+    """Ancienne implémentation de /api/workers-balances : une requête par ouvrier"""
+    db = server.db
+    workers = await db.workers.find().to_list(1000)
+    for worker_data in workers:
+        await db.transactions.find({"worker_id": worker_data["id"]}).sort("date", -1).to_list(1000)
+
+
+async def measure(call, repeat):
+    """Retourne (latence médiane en ms, nombre de commandes MongoDB par appel)"""
+    timings = []
+    commands = 0
+    for _ in range(repeat):
+        before = COMMANDS.count
+        start = time.perf_counter()
+        await call()
+        timings.append((time.perf_counter() - start) * 1000)
+        commands = COMMANDS.count - before
+    return statistics.median(timings), commands
+
+
+async def bench_workers_balances(sizes, transactions_per_worker, repeat):
+    print_header("GET /api/workers-balances")
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        async def endpoint():
+            response = await http.get("/api/workers-balances", params={"limit": 1000})
+            response.raise_for_status()
+
+        print(f"{'workers':>8} | {'legacy ms':>10} | {'legacy cmds':>11} | {'ms':>10} | {'cmds':>5}")
+        for size in sizes:
+            await seed(size, transactions_per_worker)
+            legacy_ms, legacy_cmds = await measure(legacy_workers_balances, repeat)
+            current_ms, current_cmds = await measure(endpoint, repeat)
+            print(f"{size:>8} | {legacy_ms:>10.1f} | {legacy_cmds:>11} | {current_ms:>10.1f} | {current_cmds:>5}")
+
+
+def plan_stages(plan):
+    stages = []
+    while plan:
+        stages.append(plan["stage"] + (f"({plan['indexName']})" if "indexName" in plan else ""))
+        plan = plan.get("inputStage")
+    return " <- ".join(stages)
+
+
+async def explain_worker_transactions(worker_id):
+    explain = await server.db.command(
+        "explain",
+        {
+            "find": "transactions",
+            "filter": {"worker_id": worker_id},
+            "sort": dict(server.keyset_sort("date", True)),
+            "limit": server.DEFAULT_PAGE_SIZE + 1,
+        },
+        verbosity="executionStats",
+    )
+    stats = explain["executionStats"]
+    return (
+        plan_stages(explain["queryPlanner"]["winningPlan"]),
+        stats["totalDocsExamined"],
+        stats["totalKeysExamined"],
+        stats["executionTimeMillis"],
+    )
+
+
+async def bench_query_plans(total_transactions, transactions_per_worker):
+    print_header(f"Plan de requête : historique d'un ouvrier ({total_transactions} transactions)")
+    await seed(total_transactions // transactions_per_worker, transactions_per_worker)
+    worker = await server.db.workers.find_one()
+
+    for collection_name in server.INDEXES:
+        await server.db[collection_name].drop_indexes()
+    before = await explain_worker_transactions(worker["id"])
+    await server.ensure_indexes()
+    after = await explain_worker_transactions(worker["id"])
+
+    for label, (stages, docs, keys, millis) in (("sans index", before), ("avec index", after)):
+        print(f"{label:>11}: {stages}")
+        print(f"{'':>11}  docs examinés {docs}, clés examinées {keys}, {millis} ms")
+
+
+def legacy_serialize(docs):
+    """Ancien chemin de lecture : un modèle par document, revalidation par response_model
+    puis jsonable_encoder et json.dumps"""
+    models = [server.Transaction(**doc, amount=server.from_cents(doc["amount_cents"])) for doc in docs]
+    adapter = TypeAdapter(list[server.Transaction])
+    content = adapter.dump_python(adapter.validate_python([model.model_dump() for model in models]), mode="json")
+    return json.dumps(content).encode()
+
+
+def compact_serialize(docs):
+    """Chemin actuel : documents projetés encodés directement par orjson"""
+    return orjson.dumps(docs)
+
+
+async def bench_serialization(workers_count, transactions_per_worker, repeat):
+    total = workers_count * transactions_per_worker
+    print_header(f"Sérialisation des lectures ({total} transactions)")
+    await seed(workers_count, transactions_per_worker)
+    docs = {}
+
+    async def read_full():
+        docs["full"] = await server.db.transactions.find().to_list(None)
+
+    async def read_projected():
+        docs["projected"] = await server.db.transactions.find({}, server.TRANSACTION_FIELDS).to_list(None)
+
+    paths = (
+        ("pydantic + json", read_full, "full", legacy_serialize),
+        ("projection + orjson", read_projected, "projected", compact_serialize),
+    )
+    print(f"{'chemin':>20} | {'lecture ms':>10} | {'encodage ms':>11} | {'objets/s (encodage)':>19} | {'octets':>10}")
+    for label, read, key, serialize in paths:
+        read_ms, _ = await measure(read, repeat)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            body = serialize(docs[key])
+            timings.append(time.perf_counter() - start)
+        encode_s = statistics.median(timings)
+        rate = total / encode_s if encode_s else float("inf")
+        print(f"{label:>20} | {read_ms:>10.1f} | {encode_s * 1000:>11.1f} | {rate:>19,.0f} | {len(body):>10}")
+
+
+async def bench_money(total, repeat):
+    """Totaux par ouvrier : ancien $sum de montants flottants contre $sum de centimes entiers"""
+    print_header(f"Arithmétique monétaire ({total} transactions)")
+    db = server.db
+    await db.money_bench.drop()
+    # Montants à deux décimales non représentables exactement en binaire (0.01 à 99.99)
+    docs = [
+        {"worker_id": f"w{i % 100}", "type": "due", "amount_cents": i * 7919 % 9999 + 1}
+        for i in range(total)
+    ]
+    for doc in docs:
+        doc["amount"] = server.from_cents(doc["amount_cents"])
+    for start in range(0, total, 10000):
+        await db.money_bench.insert_many(docs[start:start + 10000])
+    expected = {}
+    for doc in docs:
+        expected[doc["worker_id"]] = expected.get(doc["worker_id"], 0) + doc["amount_cents"]
+
+    results = {}
+
+    def totals_pipeline(field):
+        async def run():
+            results[field] = {
+                row["_id"]: row["total"]
+                async for row in db.money_bench.aggregate([{"$group": {"_id": "$worker_id", "total": {"$sum": field}}}])
+            }
+        return run
+
+    print(f"{'stockage':>18} | {'agrégation ms':>13} | {'totaux inexacts':>15} | {'écart max':>10}")
+    for label, field, as_cents in (
+        ("float (amount)", "$amount", lambda total: Decimal(str(total)).scaleb(2)),
+        ("centimes entiers", "$amount_cents", lambda total: total),
+    ):
+        aggregate_ms, _ = await measure(totals_pipeline(field), repeat)
+        errors = [abs(as_cents(results[field][worker_id]) - cents) for worker_id, cents in expected.items()]
+        wrong = sum(1 for error in errors if error)
+        print(f"{label:>18} | {aggregate_ms:>13.1f} | {wrong:>15} | {float(max(errors)) / 100:>10.2g}")
+    await db.money_bench.drop()
+
+
+class Endpoint:
+    """Endpoint mesuré sous charge : request(i, ctx) retourne (méthode, url, options httpx)"""
+
+    def __init__(self, name, request, setup=None, requires_server=False):
+        self.name = name
+        self.request = request
+        self.setup = setup
+        # Non supporté par mongomock : agrégations MongoDB >= 5.0, $indexStats, et
+        # lectures de transactions (amount calculé par la projection TRANSACTION_FIELDS)
+        self.requires_server = requires_server
+
+
+def pick_worker(i, ctx):
+    return ctx["worker_ids"][i % len(ctx["worker_ids"])]
+
+
+def ndjson_transactions(worker_id, count):
+    return "\n".join(
+        json.dumps({"worker_id": worker_id, "type": "due" if j % 2 else "paid", "amount": 10.0})
+        for j in range(count)
+    )
+
+
+async def setup_disposable_workers(http, ctx, count):
+    ctx["disposable_workers"] = []
+    for i in range(count):
+        response = await http.post("/api/workers", json={"name": f"Jetable {i}"})
+        ctx["disposable_workers"].append(response.json()["id"])
+
+
+async def setup_sync_token(http, ctx, count):
+    # Synchronisation complète préalable : les requêtes mesurées sont des deltas
+    token = None
+    while True:
+        response = (await http.get("/api/sync", params={"since": token, "limit": 1000} if token else {"limit": 1000})).json()
+        token = response["token"]
+        if not response["has_more"]:
+            break
+    ctx["sync_token"] = token
+
+
+async def setup_disposable_transactions(http, ctx, count):
+    worker_id = pick_worker(0, ctx)
+    await http.post(
+        "/api/transactions/bulk", params={"format": "ndjson"},
+        content=ndjson_transactions(worker_id, count)
+    )
+    response = await http.get(f"/api/workers/{worker_id}/transactions", params={"limit": count})
+    ctx["disposable_transactions"] = [t["id"] for t in response.json()]
+
+
+ENDPOINTS = [
+    Endpoint("GET /api/", lambda i, ctx: ("GET", "/api/", {})),
+    Endpoint("POST /api/workers", lambda i, ctx: (
+        "POST", "/api/workers", {"json": {"name": f"Charge {i}", "position": "Maçon"}}
+    )),
+    Endpoint("GET /api/workers", lambda i, ctx: ("GET", "/api/workers", {})),
+    Endpoint("GET /api/workers/search?q=ouvrier 4", lambda i, ctx: (
+        "GET", "/api/workers/search", {"params": {"q": "ouvrier 4"}}
+    )),
+    Endpoint("GET /api/workers/search?q=elec", lambda i, ctx: (
+        "GET", "/api/workers/search", {"params": {"q": "elec"}}
+    )),
+    Endpoint("GET /api/workers/{id}", lambda i, ctx: ("GET", f"/api/workers/{pick_worker(i, ctx)}", {})),
+    Endpoint("POST /api/transactions", lambda i, ctx: (
+        "POST", "/api/transactions",
+        {"json": {"worker_id": pick_worker(i, ctx), "type": "due", "amount": 12.5}}
+    )),
+    Endpoint("POST /api/transactions (rejeu Idempotency-Key)", lambda i, ctx: (
+        "POST", "/api/transactions",
+        {
+            "json": {"worker_id": pick_worker(i % 10, ctx), "type": "due", "amount": 12.5},
+            "headers": {"Idempotency-Key": f"bench-{i % 10}"},
+        }
+    ), requires_server=True),
+    Endpoint("POST /api/transactions/bulk (100 lignes)", lambda i, ctx: (
+        "POST", "/api/transactions/bulk",
+        {"params": {"format": "ndjson"}, "content": ndjson_transactions(pick_worker(i, ctx), 100)}
+    )),
+    Endpoint("GET /api/transactions", lambda i, ctx: ("GET", "/api/transactions", {}), requires_server=True),
+    Endpoint("GET /api/workers/{id}/transactions", lambda i, ctx: (
+        "GET", f"/api/workers/{pick_worker(i, ctx)}/transactions", {}
+    ), requires_server=True),
+    Endpoint("GET /api/workers/{id}/balance", lambda i, ctx: (
+        "GET", f"/api/workers/{pick_worker(i, ctx)}/balance", {}
+    ), requires_server=True),
+    Endpoint("GET /api/workers/{id}/balance?as_of", lambda i, ctx: (
+        "GET", f"/api/workers/{pick_worker(i, ctx)}/balance",
+        {"params": {"as_of": (datetime.utcnow() - timedelta(days=2)).isoformat()}}
+    ), requires_server=True),
+    Endpoint("GET /api/workers-balances", lambda i, ctx: ("GET", "/api/workers-balances", {}),
+             requires_server=True),
+    Endpoint("GET /api/workers-summary", lambda i, ctx: ("GET", "/api/workers-summary", {})),
+    Endpoint("POST /api/balances:batch (50 ids)", lambda i, ctx: (
+        "POST", "/api/balances:batch",
+        {"json": {"worker_ids": [pick_worker(i + j, ctx) for j in range(50)]}}
+    )),
+    Endpoint("GET /api/export/transactions", lambda i, ctx: (
+        "GET", "/api/export/transactions", {"params": {"worker_id": pick_worker(i, ctx)}}
+    ), requires_server=True),
+    Endpoint("GET /api/export/balances", lambda i, ctx: ("GET", "/api/export/balances", {})),
+    Endpoint("GET /api/reports/totals?period=month", lambda i, ctx: (
+        "GET", "/api/reports/totals", {"params": {"period": "month"}}
+    ), requires_server=True),
+    Endpoint("GET /api/reports/totals?group_by=position&period=week", lambda i, ctx: (
+        "GET", "/api/reports/totals", {"params": {"group_by": "position", "period": "week"}}
+    ), requires_server=True),
+    Endpoint("GET /api/sync?since (delta)", lambda i, ctx: (
+        "GET", "/api/sync", {"params": {"since": ctx["sync_token"]}}
+    ), setup=setup_sync_token, requires_server=True),
+    Endpoint("GET /api/admin/index-stats", lambda i, ctx: ("GET", "/api/admin/index-stats", {}),
+             requires_server=True),
+    Endpoint("GET /api/admin/cache-stats", lambda i, ctx: ("GET", "/api/admin/cache-stats", {})),
+    Endpoint("GET /api/metrics", lambda i, ctx: ("GET", "/api/metrics", {})),
+    Endpoint("GET /api/health", lambda i, ctx: ("GET", "/api/health", {})),
+    Endpoint("DELETE /api/transactions/{id}", lambda i, ctx: (
+        "DELETE", f"/api/transactions/{ctx['disposable_transactions'][i]}", {}
+    ), setup=setup_disposable_transactions, requires_server=True),
+    Endpoint("DELETE /api/workers/{id}", lambda i, ctx: (
+        "DELETE", f"/api/workers/{ctx['disposable_workers'][i]}", {}
+    ), setup=setup_disposable_workers),
+]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, round(pct / 100 * (len(sorted_values) - 1)))]
+
+
+async def run_load(http, endpoint, ctx, total, concurrency):
+    latencies = []
+    errors = 0
+    indexes = iter(range(total))
+
+    async def client_loop():
+        nonlocal errors
+        for i in indexes:
+            method, url, options = endpoint.request(i, ctx)
+            start = time.perf_counter()
+            response = await http.request(method, url, **options)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    commands_before = COMMANDS.count
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        # mongomock n'émet pas d'événements de commande
+        "db_commands_per_request": round((COMMANDS.count - commands_before) / total, 2) if not MOCK else None,
+    }
+
+
+async def bench_endpoints(args):
+    print_header(
+        f"Charge par endpoint : {args.workers} ouvriers x {args.transactions} transactions, "
+        f"{args.requests} requêtes, concurrence {args.concurrency}"
+    )
+    await seed(args.workers, args.transactions)
+    ctx = {"worker_ids": [worker["id"] async for worker in server.db.workers.find({}, {"id": 1})]}
+    results = {}
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+        print(f"{'endpoint':<45} | {'req/s':>8} | {'p50 ms':>8} | {'p99 ms':>8} | {'err':>4} | {'cmds':>5}")
+        for endpoint in ENDPOINTS:
+            if args.only and not any(term in endpoint.name for term in args.only):
+                continue
+            if MOCK and endpoint.requires_server:
+                print(f"{endpoint.name:<45} | ignoré avec --mock")
+                continue
+            if endpoint.setup:
+                await endpoint.setup(http, ctx, args.requests)
+            result = await run_load(http, endpoint, ctx, args.requests, args.concurrency)
+            results[endpoint.name] = result
+            cmds = "-" if result["db_commands_per_request"] is None else result["db_commands_per_request"]
+            print(
+                f"{endpoint.name:<45} | {result['throughput_rps']:>8} | {result['p50_ms']:>8} | "
+                f"{result['p99_ms']:>8} | {result['errors']:>4} | {cmds:>5}"
+            )
+    return results
+
+
+def compare_results(previous, current, threshold):
+    """Affiche les écarts avec un run précédent ; retourne le nombre de régressions"""
+    print_header("Comparaison avec le run précédent")
+    regressions = 0
+    for name, result in current.items():
+        before = previous.get("endpoints", {}).get(name)
+        if not before:
+            continue
+        changes = {
+            metric: (result[metric] - before[metric]) / before[metric] * 100
+            for metric in ("throughput_rps", "p50_ms", "p99_ms")
+            if before.get(metric)
+        }
+        # Débit en baisse ou latence en hausse au-delà du seuil
+        regressed = (
+            changes.get("throughput_rps", 0) < -threshold
+            or changes.get("p50_ms", 0) > threshold
+            or changes.get("p99_ms", 0) > threshold
+        )
+        regressions += regressed
+        status = "⚠️  RÉGRESSION" if regressed else "ok"
+        details = ", ".join(f"{metric} {change:+.1f}%" for metric, change in changes.items())
+        print(f"{status:<14} {name}: {details}")
+    return regressions
+
+
+def scaling_load(base_url, paths, requests, concurrency):
+    """Générateur de charge d'un processus : retourne (latences en ms, erreurs)"""
+
+    async def run():
+        latencies = []
+        errors = 0
+        indexes = iter(range(requests))
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as http:
+            async def client_loop():
+                nonlocal errors
+                for i in indexes:
+                    start = time.perf_counter()
+                    response = await http.get(paths[i % len(paths)])
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    if response.status_code >= 400:
+                        errors += 1
+
+            await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+        return latencies, errors
+
+    return asyncio.run(run())
+
+
+async def wait_until_ready(base_url, timeout=60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as http:
+        while time.monotonic() < deadline:
+            try:
+                if (await http.get("/api/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"serve.py ne répond pas sur {base_url}")
+
+
+async def bench_scaling(args):
+    """Débit des endpoints de lecture servis par serve.py avec 1..N processus"""
+    print_header(
+        f"Montée en charge multi-processus : {args.workers} ouvriers, {args.requests} requêtes, "
+        f"concurrence {args.concurrency}, {args.loaders} générateurs de charge"
+    )
+    if MOCK:
+        print("ignoré avec --mock : chaque processus aurait sa propre base en mémoire")
+        return {}
+    await seed(args.workers, args.transactions)
+    worker_ids = [worker["id"] async for worker in server.db.workers.find({}, {"id": 1}).limit(100)]
+    paths = ["/api/workers", "/api/workers-summary", "/api/transactions"] + [
+        path for worker_id in worker_ids
+        for path in (f"/api/workers/{worker_id}", f"/api/workers/{worker_id}/balance")
+    ]
+
+    env = {**os.environ, "WARMUP_PATHS": "", "MONGO_MAX_WAITING": "0"}
+    if args.no_cache:
+        env["BALANCE_CACHE_TTL"] = "0"
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = {}
+    print(f"{'processus':>9} | {'req/s':>8} | {'accélération':>12} | {'p50 ms':>8} | {'p99 ms':>8} | {'err':>4}")
+    with ProcessPoolExecutor(max_workers=args.loaders, mp_context=multiprocessing.get_context("spawn")) as pool:
+        loop = asyncio.get_running_loop()
+        for processes in args.processes:
+            serve = subprocess.Popen(
+                [sys.executable, str(BACKEND_DIR / "serve.py"), "--workers", str(processes),
+                 "--host", "127.0.0.1", "--port", str(args.port), "--log-level", "warning"],
+                cwd=BACKEND_DIR, env=env
+            )
+            try:
+                await wait_until_ready(base_url)
+                share = args.requests // args.loaders
+                concurrency = max(1, args.concurrency // args.loaders)
+                start = time.perf_counter()
+                outcomes = await asyncio.gather(*(
+                    loop.run_in_executor(pool, scaling_load, base_url, paths, share, concurrency)
+                    for _ in range(args.loaders)
+                ))
+                elapsed = time.perf_counter() - start
+            finally:
+                serve.terminate()
+                serve.wait()
+            latencies = sorted(latency for loader_latencies, _ in outcomes for latency in loader_latencies)
+            throughput = round(len(latencies) / elapsed, 1)
+            results[processes] = {
+                "throughput_rps": throughput,
+                "p50_ms": round(percentile(latencies, 50), 3),
+                "p99_ms": round(percentile(latencies, 99), 3),
+                "errors": sum(errors for _, errors in outcomes),
+            }
+            speedup = throughput / results[args.processes[0]]["throughput_rps"]
+            print(
+                f"{processes:>9} | {throughput:>8} | {speedup:>11.2f}x | {results[processes]['p50_ms']:>8} | "
+                f"{results[processes]['p99_ms']:>8} | {results[processes]['errors']:>4}"
+            )
+    return results
+
+
+SCENARIOS = ("endpoints", "workers-balances", "query-plans", "serialization", "money", "concurrent-writes",
+             "compression", "scaling")
+MOCK = False
+
+
+def use_mongomock():
+    global MOCK
+    from mongomock_motor import AsyncMongoMockClient
+
+    MOCK = True
+    server.create_client = AsyncMongoMockClient
+    server.MONGO_TRANSACTIONS = "off"  # ni sessions ni transactions dans mongomock
+
+
+async def bench_concurrent_writes(args):
+    """Créations de transactions et suppressions d'ouvriers concurrentes, par mode d'écriture
+    (MONGO_TRANSACTIONS) : débit, latence et lignes orphelines une fois les purges terminées.
+    Le mode "on" demande un replica set (docker-compose.replica-set.yml) :
+        docker compose -f docker-compose.replica-set.yml up -d --wait
+        MONGO_URL="mongodb://localhost:27017/?replicaSet=rs0&directConnection=true"
+    """
+    print_header(
+        f"Écritures concurrentes : {args.workers} ouvriers, {args.requests} créations, "
+        f"1 ouvrier sur 4 supprimé, concurrence {args.concurrency}"
+    )
+    print(f"{'mode':>6} | {'op/s':>8} | {'p50 ms':>8} | {'p99 ms':>8} | {'404':>5} | {'orphelins':>9}")
+    results = {}
+    for mode in args.write_modes:
+        if MOCK and mode != "off":
+            print(f"{mode:>6} | ignoré avec --mock")
+            continue
+        server.MONGO_TRANSACTIONS = "auto"
+        server.transactions_supported = None
+        if mode == "on" and not await server.use_transactions():
+            # Serveur autonome : chaque écriture échouerait (IllegalOperation)
+            print(f"{mode:>6} | ignoré : replica set requis (docker-compose.replica-set.yml)")
+            continue
+        server.MONGO_TRANSACTIONS = mode
+        server.transactions_supported = None
+        await seed(args.workers, 0)
+        worker_ids = [worker["id"] async for worker in server.db.workers.find({}, {"id": 1})]
+        operations = [("POST", worker_ids[i % len(worker_ids)]) for i in range(args.requests)]
+        operations += [("DELETE", worker_id) for worker_id in worker_ids[::4]]
+        random.Random(0).shuffle(operations)
+
+        latencies = []
+        not_found = 0
+        pending = iter(operations)
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+            async def client_loop():
+                nonlocal not_found
+                for method, worker_id in pending:
+                    start = time.perf_counter()
+                    if method == "POST":
+                        response = await http.post(
+                            "/api/transactions", json={"worker_id": worker_id, "type": "due", "amount": 12.5}
+                        )
+                    else:
+                        response = await http.delete(f"/api/workers/{worker_id}")
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    if response.status_code == 404:
+                        not_found += 1
+                    elif response.status_code >= 400:
+                        raise RuntimeError(f"{method} {worker_id} : {response.status_code} {response.text}")
+
+            start = time.perf_counter()
+            await asyncio.gather(*(client_loop() for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - start
+        await server.job_queue.join()
+
+        # Transactions et soldes dont l'ouvrier n'existe plus ou est supprimé
+        active = {worker["id"] async for worker in server.db.workers.find(server.ACTIVE_WORKERS, {"id": 1})}
+        orphans = sum([
+            await server.db.transactions.count_documents({"worker_id": {"$nin": list(active)}}),
+            await server.db.worker_balances.count_documents({"_id": {"$nin": list(active)}}),
+        ])
+        latencies.sort()
+        results[mode] = (len(operations) / elapsed, percentile(latencies, 99))
+        print(
+            f"{mode:>6} | {results[mode][0]:>8.1f} | {percentile(latencies, 50):>8.2f} | "
+            f"{results[mode][1]:>8.2f} | {not_found:>5} | {orphans:>9}"
+        )
+    if "off" in results and "on" in results:
+        print(
+            f"on / off : débit x{results['on'][0] / results['off'][0]:.2f}, "
+            f"p99 x{results['on'][1] / results['off'][1]:.2f}"
+        )
+
+
+# (chemin, nécessite un vrai serveur MongoDB : voir Endpoint.requires_server)
+COMPRESSION_PATHS = (
+    ("/api/workers?limit=500", False),
+    ("/api/transactions?limit=500", True),
+    ("/api/workers-balances?limit=1000", True),
+    ("/api/export/balances?format=csv", False),
+    ("/api/export/transactions?format=csv", True),
+)
+
+
+async def bench_compression(args):
+    """Octets sur le réseau et latence par encodage (Accept-Encoding), puis revalidation
+    par If-None-Match. La latence de bout en bout ajoute au temps de l'application le
+    transfert du corps sur un lien de --link-mbps Mbit/s (ASGITransport n'a pas de réseau).
+    """
+    print_header(
+        f"Compression et cache HTTP : {args.workers} ouvriers x {args.transactions} transactions, "
+        f"lien {args.link_mbps} Mbit/s"
+    )
+    await seed(args.workers, args.transactions)
+    variants = (("identity", "identity"), ("gzip", "gzip"), ("br", "br"), ("304", "br, gzip"))
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+        print(f"{'endpoint':<38} | {'encodage':>8} | {'octets':>10} | {'ratio':>6} | {'app ms':>8} | {'total ms':>9}")
+        for path, requires_server in COMPRESSION_PATHS:
+            if args.only and not any(term in path for term in args.only):
+                continue
+            if MOCK and requires_server:
+                print(f"{path:<38} | ignoré avec --mock")
+                continue
+            identity_bytes = None
+            etag = None
+            for label, accept in variants:
+                headers = {"Accept-Encoding": accept}
+                if label == "304":
+                    if etag is None:
+                        continue
+                    headers["If-None-Match"] = etag
+                timings = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    response = await http.get(path, headers=headers)
+                    timings.append((time.perf_counter() - start) * 1000)
+                if response.status_code >= 400:
+                    print(f"{path:<38} | {label:>8} | erreur {response.status_code}")
+                    break
+                etag = response.headers.get("etag", etag)
+                # Taille du corps tel que reçu, avant décompression par httpx
+                wire_bytes = response.num_bytes_downloaded
+                if identity_bytes is None:
+                    identity_bytes = wire_bytes
+                app_ms = statistics.median(timings)
+                total_ms = app_ms + wire_bytes * 8 / (args.link_mbps * 1000)
+                ratio = wire_bytes / identity_bytes if identity_bytes else 0
+                print(
+                    f"{path:<38} | {label:>8} | {wire_bytes:>10} | {ratio:>6.2f} | "
+                    f"{app_ms:>8.1f} | {total_ms:>9.1f}"
+                )
+
+
+async def main(args):
+    if args.mock:
+        use_mongomock()
+        print("MongoDB: mongomock (en mémoire)")
+    else:
+        print(f"MongoDB: {os.environ.get('MONGO_URL')} / base {os.environ['DB_NAME']}")
+    server.connect_db()
+    if args.no_cache:
+        server.balance_cache.ttl = 0
+    # ASGITransport n'exécute pas les événements de démarrage de l'application
+    await server.job_queue.start(server.db.jobs)
+
+    regressions = 0
+    if "endpoints" in args.scenarios:
+        results = await bench_endpoints(args)
+        report = {
+            "meta": {
+                "timestamp": datetime.utcnow().isoformat(),
+                "python": platform.python_version(),
+                "mongo": "mongomock" if MOCK else "mongodb",
+                "workers": args.workers,
+                "transactions_per_worker": args.transactions,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "cache": not args.no_cache,
+            },
+            "endpoints": results,
+        }
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            print(f"\nRésultats écrits dans {args.output}")
+        if args.compare:
+            with open(args.compare) as f:
+                regressions = compare_results(json.load(f), results, args.regression_threshold)
+    if "workers-balances" in args.scenarios:
+        await bench_workers_balances(args.sizes, args.transactions, args.repeat)
+    if "query-plans" in args.scenarios:
+        await bench_query_plans(args.plan_transactions, args.transactions * 20)
+    if "serialization" in args.scenarios:
+        await bench_serialization(args.workers, args.transactions, args.repeat)
+    if "money" in args.scenarios:
+        await bench_money(args.workers * args.transactions, args.repeat)
+    if "concurrent-writes" in args.scenarios:
+        await bench_concurrent_writes(args)
+    if "compression" in args.scenarios:
+        await bench_compression(args)
+    if "scaling" in args.scenarios:
+        await bench_scaling(args)
+    await server.job_queue.stop()
+    server.close_db()
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=["endpoints"],
+                        help="benchmarks à exécuter")
+    parser.add_argument("--mock", action="store_true",
+                        help="utiliser mongomock_motor au lieu d'un MongoDB local")
+    parser.add_argument("--workers", type=int, default=1000,
+                        help="ouvriers du jeu de données (scénario endpoints)")
+    parser.add_argument("--transactions", type=int, default=5,
+                        help="transactions par ouvrier")
+    parser.add_argument("--requests", type=int, default=200,
+                        help="requêtes par endpoint")
+    parser.add_argument("--concurrency", type=int, default=10,
+                        help="requêtes simultanées")
+    parser.add_argument("--only", nargs="+",
+                        help="ne mesurer que les endpoints dont le nom contient un de ces termes")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="désactiver le cache des soldes pendant la mesure")
+    parser.add_argument("--output", help="fichier JSON où écrire les résultats")
+    parser.add_argument("--compare", help="résultats JSON d'un run précédent à comparer")
+    parser.add_argument("--regression-threshold", type=float, default=10.0,
+                        help="écart en %% au-delà duquel un endpoint est signalé en régression")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="nombres d'ouvriers à tester (scénario workers-balances)")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="répétitions par mesure (la médiane est retenue)")
+    parser.add_argument("--plan-transactions", type=int, default=1_000_000,
+                        help="taille du jeu de données pour la comparaison des plans de requête")
+    parser.add_argument("--write-modes", nargs="+", choices=("off", "on", "auto"), default=["off", "auto"],
+                        help="valeurs de MONGO_TRANSACTIONS comparées (scénario concurrent-writes)")
+    parser.add_argument("--link-mbps", type=float, default=10.0,
+                        help="débit du lien simulé pour la latence de bout en bout (compression)")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4],
+                        help="nombres de processus serve.py à tester (scénario scaling)")
+    parser.add_argument("--loaders", type=int, default=4,
+                        help="processus générateurs de charge (scénario scaling)")
+    parser.add_argument("--port", type=int, default=8765,
+                        help="port d'écoute de serve.py (scénario scaling)")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -6,12 +6,16 @@ Tests all CRUD operations, balance calculations, and data integrity
 
 import requests
 import json
+import os
 import sys
 from datetime import datetime
 import time
 
-# Load backend URL from frontend .env
+# Load backend URL from BACKEND_URL, or from frontend .env
+# (performance measurements live in backend_bench.py)
 def get_backend_url():
+    if os.environ.get('BACKEND_URL'):
+        return os.environ['BACKEND_URL']
     try:
         with open('/app/frontend/.env', 'r') as f:
             for line in f:
@@ -459,15 +463,23 @@ def test_delete_worker():
         response = requests.get(f"{API_URL}/workers/{worker_id}/transactions", timeout=10)
         initial_transactions = len(response.json()) if response.status_code == 200 else 0
         
-        # Delete the worker
+        # Delete the worker (transactions are purged by a background job)
         response = requests.delete(f"{API_URL}/workers/{worker_id}", timeout=10)
-        success = response.status_code == 200
+        success = response.status_code == 202
         
         if success:
             # Verify worker is deleted
+            job_id = response.json()["job_id"]
             response = requests.get(f"{API_URL}/workers/{worker_id}", timeout=10)
             worker_deleted = response.status_code == 404
             
+            # Wait for the purge job to finish
+            for _ in range(50):
+                job = requests.get(f"{API_URL}/jobs/{job_id}", timeout=10).json()
+                if job["status"] in ("done", "failed"):
+                    break
+                time.sleep(0.2)
+            
             # Verify worker's transactions are also deleted
             response = requests.get(f"{API_URL}/workers/{worker_id}/transactions", timeout=10)
             transactions_deleted = response.status_code == 404 or len(response.json()) == 0
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import "./App.css";
 import axios from "axios";
 
@@ -11,6 +11,10 @@ function App() {
   const [showAddWorker, setShowAddWorker] = useState(false);
   const [showAddTransaction, setShowAddTransaction] = useState(false);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // Live updates: while /api/events is connected, state is patched from events
+  const liveRef = useRef(false);
+  const selectedIdRef = useRef(null);
 
   // Form states
   const [newWorker, setNewWorker] = useState({
@@ -26,11 +30,20 @@ function App() {
     description: ""
   });
 
-  // Fetch workers with balances
+  // Fetch workers with their totals (history is loaded when a worker is opened)
   const fetchWorkersBalances = async () => {
     try {
-      const response = await axios.get(`${API}/workers-balances`);
-      setWorkers(response.data);
+      // L'API pagine par curseur : suivre X-Next-Cursor jusqu'à la dernière page
+      let allWorkers = [];
+      let cursor = null;
+      do {
+        const response = await axios.get(`${API}/workers-summary`, {
+          params: { limit: 1000, ...(cursor && { cursor }) }
+        });
+        allWorkers = allWorkers.concat(response.data);
+        cursor = response.headers["x-next-cursor"];
+      } while (cursor);
+      setWorkers(allWorkers);
       setLoading(false);
     } catch (error) {
       console.error("Erreur lors du chargement des ouvriers:", error);
@@ -38,8 +51,130 @@ function App() {
     }
   };
 
+  // Fetch one worker with its transaction history
+  const openWorker = async (workerId) => {
+    try {
+      const response = await axios.get(`${API}/workers/${workerId}/balance`);
+      setSelectedWorker(response.data);
+    } catch (error) {
+      console.error("Erreur lors du chargement de l'ouvrier:", error);
+    }
+  };
+
+  // Next page of the history, following transactions_next_cursor
+  const loadMoreTransactions = async () => {
+    const { worker, transactions_next_cursor: cursor } = selectedWorker;
+    setLoadingMore(true);
+    try {
+      const response = await axios.get(`${API}/workers/${worker.id}/balance`, {
+        params: { cursor }
+      });
+      setSelectedWorker((current) => {
+        if (!current || current.worker.id !== worker.id) {
+          return current;
+        }
+        const known = new Set(current.transactions.map((t) => t.id));
+        return {
+          ...current,
+          transactions: current.transactions.concat(
+            response.data.transactions.filter((t) => !known.has(t.id))
+          ),
+          transactions_next_cursor: response.data.transactions_next_cursor
+        };
+      });
+    } catch (error) {
+      console.error("Erreur lors du chargement de l'historique:", error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // Full reload only when live updates are not connected
+  const refreshIfOffline = async () => {
+    if (!liveRef.current) {
+      await fetchWorkersBalances();
+    }
+  };
+
+  useEffect(() => {
+    selectedIdRef.current = selectedWorker ? selectedWorker.worker.id : null;
+  }, [selectedWorker]);
+
   useEffect(() => {
     fetchWorkersBalances();
+    if (typeof EventSource === "undefined") {
+      return undefined;
+    }
+
+    const applyTotals = (data) => {
+      const totals = {
+        total_due: data.total_due,
+        total_paid: data.total_paid,
+        balance: data.balance,
+        transaction_count: data.transaction_count
+      };
+      setWorkers((current) =>
+        current.map((w) => (w.worker.id === data.worker_id ? { ...w, ...totals } : w))
+      );
+      setSelectedWorker((current) =>
+        current && current.worker.id === data.worker_id ? { ...current, ...totals } : current
+      );
+    };
+
+    const events = new EventSource(`${API}/events`);
+    const on = (type, handler) =>
+      events.addEventListener(type, (event) => handler(JSON.parse(event.data)));
+
+    events.onopen = () => {
+      // (Re)connexion : recharger une fois pour rattraper les événements manqués
+      liveRef.current = true;
+      fetchWorkersBalances();
+    };
+    events.onerror = () => {
+      liveRef.current = false;
+    };
+    on("worker_created", (summary) => {
+      setWorkers((current) =>
+        current.some((w) => w.worker.id === summary.worker.id) ? current : [...current, summary]
+      );
+    });
+    on("worker_deleted", (data) => {
+      setWorkers((current) => current.filter((w) => w.worker.id !== data.worker_id));
+      setSelectedWorker((current) =>
+        current && current.worker.id === data.worker_id ? null : current
+      );
+    });
+    on("transaction_created", (data) => {
+      applyTotals(data);
+      setSelectedWorker((current) =>
+        current && current.worker.id === data.worker_id &&
+        !current.transactions.some((t) => t.id === data.transaction.id)
+          ? { ...current, transactions: [data.transaction, ...current.transactions] }
+          : current
+      );
+    });
+    on("transaction_deleted", (data) => {
+      applyTotals(data);
+      setSelectedWorker((current) =>
+        current && current.worker.id === data.worker_id
+          ? { ...current, transactions: current.transactions.filter((t) => t.id !== data.transaction_id) }
+          : current
+      );
+    });
+    on("balance_changed", (data) => {
+      applyTotals(data);
+      if (selectedIdRef.current === data.worker_id) {
+        openWorker(data.worker_id);
+      }
+    });
+    on("resync", () => {
+      fetchWorkersBalances();
+      if (selectedIdRef.current) {
+        openWorker(selectedIdRef.current);
+      }
+    });
+
+    return () => events.close();
   }, []);
 
   // Add new worker
@@ -49,7 +184,7 @@ function App() {
       await axios.post(`${API}/workers`, newWorker);
       setNewWorker({ name: "", position: "", phone: "" });
       setShowAddWorker(false);
-      await fetchWorkersBalances();
+      await refreshIfOffline();
     } catch (error) {
       console.error("Erreur lors de l'ajout de l'ouvrier:", error);
       alert("Erreur lors de l'ajout de l'ouvrier");
@@ -66,7 +201,7 @@ function App() {
       });
       setNewTransaction({ worker_id: "", type: "due", amount: "", description: "" });
       setShowAddTransaction(false);
-      await fetchWorkersBalances();
+      await refreshIfOffline();
     } catch (error) {
       console.error("Erreur lors de l'ajout de la transaction:", error);
       alert("Erreur lors de l'ajout de la transaction");
@@ -78,7 +213,7 @@ function App() {
     if (window.confirm("Êtes-vous sûr de vouloir supprimer cet ouvrier et toutes ses transactions ?")) {
       try {
         await axios.delete(`${API}/workers/${workerId}`);
-        await fetchWorkersBalances();
+        await refreshIfOffline();
       } catch (error) {
         console.error("Erreur lors de la suppression:", error);
         alert("Erreur lors de la suppression");
@@ -91,11 +226,12 @@ function App() {
     if (window.confirm("Êtes-vous sûr de vouloir supprimer cette transaction ?")) {
       try {
         await axios.delete(`${API}/transactions/${transactionId}`);
-        await fetchWorkersBalances();
-        // Refresh selected worker if viewing details
-        if (selectedWorker) {
-          const updatedWorker = workers.find(w => w.worker.id === selectedWorker.worker.id);
-          setSelectedWorker(updatedWorker);
+        // Refresh selected worker if viewing details (done by the event when live)
+        if (!liveRef.current) {
+          await fetchWorkersBalances();
+          if (selectedWorker) {
+            await openWorker(selectedWorker.worker.id);
+          }
         }
       } catch (error) {
         console.error("Erreur lors de la suppression de la transaction:", error);
@@ -163,7 +299,7 @@ function App() {
             <div
               key={workerBalance.worker.id}
               className="bg-white rounded-lg shadow-md p-6 hover:shadow-lg transition-shadow cursor-pointer"
-              onClick={() => setSelectedWorker(workerBalance)}
+              onClick={() => openWorker(workerBalance.worker.id)}
             >
               <div className="flex justify-between items-start mb-4">
                 <div>
@@ -216,7 +352,7 @@ function App() {
               </div>
 
               <div className="mt-4 text-sm text-gray-500">
-                {workerBalance.transactions.length} transaction(s)
+                {workerBalance.transaction_count} transaction(s)
               </div>
             </div>
           ))}
@@ -465,6 +601,15 @@ function App() {
                         </div>
                       </div>
                     ))}
+                    {selectedWorker.transactions_next_cursor && (
+                      <button
+                        onClick={loadMoreTransactions}
+                        disabled={loadingMore}
+                        className="w-full py-2 text-blue-600 border border-blue-200 rounded-lg hover:bg-blue-50 transition-colors disabled:opacity-50"
+                      >
+                        {loadingMore ? "Chargement..." : "Afficher plus de transactions"}
+                      </button>
+                    )}
                   </div>
                 ) : (
                   <p className="text-gray-500 text-center py-8">
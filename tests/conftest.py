@@ -0,0 +1,114 @@
+"""
+Fixtures des tests du backend : l'application FastAPI sur une base MongoDB en
+mémoire (mongomock-motor), sans serveur à lancer.
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "payroll_test")
+
+import server  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+
+
+def support_computed_projections():
+    # mongomock n'évalue pas les expressions dans les projections de find()
+    # (TRANSACTION_FIELDS calcule amount depuis amount_cents, MongoDB >= 4.4)
+    import mongomock.aggregate
+    import mongomock.collection
+
+    copy_only_fields = mongomock.collection.Collection._copy_only_fields
+    if getattr(copy_only_fields, "computed", False):
+        return
+
+    def copy_fields(self, doc, fields, container):
+        computed = {
+            name: value for name, value in (fields or {}).items()
+            if isinstance(value, dict) and any(key.startswith("$") for key in value)
+        }
+        if not computed:
+            return copy_only_fields(self, doc, fields, container)
+        result = copy_only_fields(self, doc, {k: v for k, v in fields.items() if k not in computed}, container)
+        for name, expression in computed.items():
+            result[name] = mongomock.aggregate._Parser(doc).parse(expression)
+        return result
+
+    copy_fields.computed = True
+    mongomock.collection.Collection._copy_only_fields = copy_fields
+
+
+def support_date_trunc():
+    # $dateTrunc (checkpoints, rapports) absent de mongomock : jour, semaine, mois
+    import mongomock.aggregate
+
+    if "$dateTrunc" in mongomock.aggregate.date_operators:
+        return
+    handle_date_operator = mongomock.aggregate._Parser._handle_date_operator
+
+    def handle(self, operator, values):
+        if operator != "$dateTrunc":
+            return handle_date_operator(self, operator, values)
+        return server.period_start(self.parse(values["date"]), values["unit"])
+
+    mongomock.aggregate.date_operators.append("$dateTrunc")
+    mongomock.aggregate._Parser._handle_date_operator = handle
+
+
+def ignore_storage_options():
+    # Options de stockage (archive compressée en zstd) refusées par mongomock
+    import mongomock.database
+
+    create_collection = mongomock.database.Database.create_collection
+    if getattr(create_collection, "storage_options_ignored", False):
+        return
+
+    def create(self, name, **kwargs):
+        kwargs.pop("storageEngine", None)
+        return create_collection(self, name, **kwargs)
+
+    create.storage_options_ignored = True
+    mongomock.database.Database.create_collection = create
+
+
+@pytest.fixture
+def db(monkeypatch):
+    support_computed_projections()
+    support_date_trunc()
+    ignore_storage_options()
+    db_client = AsyncMongoMockClient()
+    database = db_client[server.DB_NAME]
+    monkeypatch.setattr(server, "client", db_client)
+    monkeypatch.setattr(server, "db", database)
+    # Ni sessions ni transactions dans mongomock
+    monkeypatch.setattr(server, "MONGO_TRANSACTIONS", "off")
+    # Caches propres à chaque test
+    monkeypatch.setattr(server, "balance_cache", server.BalanceCache(ttl=60, max_entries=1000))
+    monkeypatch.setattr(server, "report_cache", server.BalanceCache(ttl=60, max_entries=1000))
+    return database
+
+
+@pytest.fixture
+def client(db):
+    # Sans lifespan : ni index, ni file de tâches, ni préchauffage
+    return TestClient(server.app)
+
+
+@pytest.fixture
+def run():
+    # Exécute une coroutine du serveur (reconcile_ledger...) hors requête HTTP
+    return asyncio.run
+
+
+@pytest.fixture
+def worker(client):
+    response = client.post("/api/workers", json={"name": "Awa Diallo", "position": "Maçonne"})
+    assert response.status_code == 200
+    return response.json()
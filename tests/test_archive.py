@@ -0,0 +1,75 @@
+import json
+from datetime import datetime
+
+import pytest
+
+import server
+
+NOW = datetime(2025, 6, 1)  # archivage des transactions antérieures au 2024-06-01
+
+
+@pytest.fixture
+def history(client, db, run, worker, monkeypatch):
+    run(server.bootstrap_db())
+    monkeypatch.setattr(server, "BULK_BATCH_SIZE", 3)  # plusieurs lots
+    rows = [("due", 10 + i, f"2023-{i + 1:02d}-15T08:00:00") for i in range(8)]
+    rows += [("paid", 4, "2024-05-31T23:00:00"), ("due", 7, "2024-06-01T00:00:00"), ("paid", 2, "2025-03-01T08:00:00")]
+    content = "\n".join(
+        json.dumps({"worker_id": worker["id"], "type": kind, "amount": amount, "date": date}) for kind, amount, date in rows
+    )
+    client.post("/api/transactions/bulk", content=content, headers={"Content-Type": "application/x-ndjson"})
+    return client.get(f"/api/workers/{worker['id']}/balance", params={"limit": 100}).json()
+
+
+def test_archive_moves_old_rows_and_keeps_totals(client, db, run, worker, history):
+    result = run(server.archive_transactions(now=NOW))
+    assert result == {"archived": 9, "archived_before": datetime(2024, 6, 1)}
+    assert run(db.transactions.count_documents({})) == 2
+    assert run(db.transactions_archive.count_documents({})) == 9
+
+    after = client.get(f"/api/workers/{worker['id']}/balance", params={"limit": 100}).json()
+    assert after["balance"] == history["balance"]
+    assert [t["id"] for t in after["transactions"]] == [t["id"] for t in history["transactions"][:2]]
+    full = client.get(f"/api/workers/{worker['id']}/balance", params={"limit": 100, "include_archive": True}).json()
+    assert full["transactions"] == history["transactions"]
+    assert run(server.reconcile_ledger(dry_run=True)) == []
+
+
+def test_archived_history_pages_across_both_collections(client, run, worker, history):
+    run(server.archive_transactions(now=NOW))
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 4, "include_archive": True, **({"cursor": cursor} if cursor else {})}
+        response = client.get(f"/api/workers/{worker['id']}/transactions", params=params)
+        ids += [t["id"] for t in response.json()]
+        cursor = response.headers.get(server.NEXT_CURSOR_HEADER)
+        if not cursor:
+            break
+    assert ids == [t["id"] for t in history["transactions"]]
+
+
+def test_interrupted_archive_is_resumed_without_double_count(db, run, history):
+    # Lot copié dans l'archive mais pas encore retiré de db.transactions
+    copied = run(db.transactions.find({"date": {"$lt": datetime(2023, 3, 1)}}, {"_id": 0}).to_list(None))
+    run(db.transactions_archive.insert_many(copied))
+
+    assert run(server.archive_transactions(now=NOW))["archived"] == 9
+    assert run(db.transactions_archive.count_documents({})) == 9
+    assert run(server.reconcile_ledger(dry_run=True)) == []
+
+
+def test_deleting_an_archived_transaction_updates_carried_totals(client, db, run, worker, history):
+    run(server.archive_transactions(now=NOW))
+    oldest = history["transactions"][-1]
+    assert client.delete(f"/api/transactions/{oldest['id']}").status_code == 200
+    assert run(db.archive_totals.find_one({"_id": worker["id"]}))["transaction_count"] == 8
+    assert run(server.reconcile_ledger(dry_run=True)) == []
+
+
+def test_reconcile_does_not_run_during_archiving(run, history):
+    async def scenario():
+        async with server.ledger_lock("archive"):
+            with pytest.raises(server.LedgerBusy):
+                await server.reconcile_ledger(dry_run=True)
+
+    run(scenario())
@@ -0,0 +1,27 @@
+def import_csv(client, content):
+    response = client.post("/api/transactions/bulk", content=content, headers={"Content-Type": "text/csv"})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_quoted_newline_stays_in_its_field(client, worker):
+    content = (
+        "worker_id,type,amount,description\r\n"
+        f'{worker["id"]},due,10,"Chantier nord\r\nsemaine 12"\r\n'
+        f'{worker["id"]},paid,4,"avance ""urgente"""\r\n'
+    )
+    assert import_csv(client, content) == {"inserted": 2, "error_count": 0, "errors": []}
+    descriptions = {t["description"] for t in client.get(f"/api/workers/{worker['id']}/transactions").json()}
+    assert descriptions == {"Chantier nord\nsemaine 12", 'avance "urgente"'}
+
+
+def test_errors_report_the_first_line_of_a_record(client, worker):
+    content = (
+        "worker_id,type,amount,description\n"
+        f'{worker["id"]},due,10,"sur\ndeux lignes"\n'
+        f'{worker["id"]},du,5,x\n'
+        f'{worker["id"]},due,7,"jamais fermé\n'
+    )
+    result = import_csv(client, content)
+    assert result["inserted"] == 1
+    assert [error["line"] for error in result["errors"]] == [4, 5]
@@ -0,0 +1,78 @@
+import json
+from datetime import datetime
+
+import pytest
+
+import server
+
+
+def import_rows(client, worker_id, *rows):
+    content = "\n".join(
+        json.dumps({"worker_id": worker_id, "type": "due", "amount": amount, "date": date}) for amount, date in rows
+    )
+    response = client.post("/api/transactions/bulk", content=content, headers={"Content-Type": "application/x-ndjson"})
+    assert response.json()["inserted"] == len(rows), response.text
+
+
+def checkpoint(db, run, worker_id, period_end):
+    return run(db.balance_checkpoints.find_one({"worker_id": worker_id, "period_end": period_end}))
+
+
+def balance_as_of(client, worker_id, as_of):
+    return client.get(f"/api/workers/{worker_id}/balance", params={"as_of": as_of}).json()["balance"]
+
+
+def test_checkpoints_accumulate_closed_periods(client, db, run, worker):
+    import_rows(client, worker["id"], (100, "2024-01-10T00:00:00"), (20, "2024-02-03T00:00:00"))
+    assert run(server.create_checkpoints(now=datetime(2024, 3, 1))) == 2
+    # Déjà à jour : rien à recréer
+    assert run(server.create_checkpoints(now=datetime(2024, 3, 15))) == 0
+
+    assert checkpoint(db, run, worker["id"], datetime(2024, 2, 1))["due_cents"] == 10000
+    assert checkpoint(db, run, worker["id"], datetime(2024, 3, 1))["due_cents"] == 12000
+    assert balance_as_of(client, worker["id"], "2024-02-02T00:00:00") == 100
+    assert balance_as_of(client, worker["id"], "2024-03-15T00:00:00") == 120
+
+
+def test_import_into_closed_period_corrects_later_checkpoints(client, db, run, worker):
+    import_rows(client, worker["id"], (100, "2024-01-10T00:00:00"), (20, "2024-02-03T00:00:00"))
+    run(server.create_checkpoints(now=datetime(2024, 3, 1)))
+
+    import_rows(client, worker["id"], (5, "2024-01-20T00:00:00"))
+    assert checkpoint(db, run, worker["id"], datetime(2024, 2, 1))["due_cents"] == 10500
+    assert checkpoint(db, run, worker["id"], datetime(2024, 3, 1))["due_cents"] == 12500
+
+
+def test_back_dated_import_after_last_checkpoint_is_counted(client, db, run, worker):
+    import_rows(client, worker["id"], (100, "2024-01-10T00:00:00"))
+    for month in (2, 3, 4):
+        run(server.create_checkpoints(now=datetime(2024, month, 1)))
+
+    # Daté entre le dernier checkpoint (1er février) et le passage précédent (1er avril)
+    import_rows(client, worker["id"], (50, "2024-02-15T00:00:00"))
+    import_rows(client, worker["id"], (10, "2024-04-20T00:00:00"))
+    run(server.create_checkpoints(now=datetime(2024, 5, 1)))
+
+    assert checkpoint(db, run, worker["id"], datetime(2024, 5, 1))["due_cents"] == 16000
+    assert balance_as_of(client, worker["id"], "2024-05-15T00:00:00") == 160
+
+
+def test_first_checkpoint_includes_history_before_the_watermark(client, db, run, worker):
+    run(server.create_checkpoints(now=datetime(2024, 2, 1)))
+    import_rows(client, worker["id"], (30, "2024-01-05T00:00:00"), (12, "2024-02-10T00:00:00"))
+    run(server.create_checkpoints(now=datetime(2024, 3, 1)))
+
+    assert checkpoint(db, run, worker["id"], datetime(2024, 3, 1))["due_cents"] == 4200
+    assert balance_as_of(client, worker["id"], "2024-03-02T00:00:00") == 42
+
+
+def test_checkpoints_do_not_run_during_archiving(client, db, run, worker):
+    import_rows(client, worker["id"], (100, "2024-01-10T00:00:00"))
+
+    async def scenario():
+        async with server.ledger_lock("archive"):
+            with pytest.raises(server.LedgerBusy):
+                await server.create_checkpoints(now=datetime(2024, 2, 1))
+        return await server.create_checkpoints(now=datetime(2024, 2, 1))
+
+    assert run(scenario()) == 1
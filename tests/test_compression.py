@@ -0,0 +1,63 @@
+from datetime import datetime
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def workers(client):
+    # Liste assez longue pour dépasser COMPRESSION_MIN_SIZE
+    for i in range(40):
+        client.post("/api/workers", json={"name": f"Ouvrier {i}", "position": "Électricienne"})
+
+
+def get(client, path, encoding, etag=None):
+    headers = {"Accept-Encoding": encoding, **({"If-None-Match": etag} if etag else {})}
+    return client.get(path, headers=headers)
+
+
+def test_each_encoding_has_its_own_etag_and_varies(client, workers):
+    identity = get(client, "/api/workers", "identity")
+    gzipped = get(client, "/api/workers", "gzip")
+    assert "content-encoding" not in identity.headers
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert identity.headers["etag"] != gzipped.headers["etag"]
+    assert gzipped.headers["etag"] == identity.headers["etag"][:-1] + '-gzip"'
+    for response in (identity, gzipped):
+        assert "accept-encoding" in response.headers["vary"].lower()
+    assert gzipped.json() == identity.json()
+
+
+def test_revalidation_matches_the_representation(client, workers):
+    gzip_etag = get(client, "/api/workers", "gzip").headers["etag"]
+    identity_etag = get(client, "/api/workers", "identity").headers["etag"]
+
+    not_modified = get(client, "/api/workers", "gzip", gzip_etag)
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == gzip_etag
+    # Le 304 reste attribué à sa route dans les métriques
+    assert server.metrics_registry.requests[("GET", "/api/workers", 304)] >= 1
+    assert server.metrics_registry.requests[("GET", "unmatched", 304)] == 0
+    assert get(client, "/api/workers", "identity", identity_etag).status_code == 304
+    # ETag de la version gzip présenté sans accepter gzip : autre représentation
+    assert get(client, "/api/workers", "identity", gzip_etag).status_code == 200
+
+
+def test_small_responses_still_vary(client, worker):
+    response = get(client, f"/api/workers/{worker['id']}", "gzip")
+    assert "content-encoding" not in response.headers
+    assert "accept-encoding" in response.headers["vary"].lower()
+
+
+def test_search_backfill_changes_the_etag(client, db, run):
+    # Ouvrier antérieur aux clés de recherche : introuvable avant "manage.py index-search"
+    run(db.workers.insert_one({"id": "w-1", "name": "Fatou Ndiaye", "position": None, "phone": None,
+                               "created_at": datetime(2024, 1, 1), "deleted_at": None}))
+    before = client.get("/api/workers/search", params={"q": "fatou"})
+    assert before.json() == []
+
+    assert run(server.backfill_worker_search()) == 1
+    after = client.get("/api/workers/search", params={"q": "fatou"}, headers={"If-None-Match": before.headers["etag"]})
+    assert after.status_code == 200
+    assert [worker["id"] for worker in after.json()] == ["w-1"]
@@ -0,0 +1,24 @@
+import server
+
+
+def post_transaction(client, worker_id, amount, key):
+    return client.post(
+        "/api/transactions",
+        json={"worker_id": worker_id, "type": "due", "amount": amount},
+        headers={"Idempotency-Key": key},
+    )
+
+
+def test_idempotent_replay_writes_once(client, db, run, worker):
+    first = post_transaction(client, worker["id"], 25, "paie-1")
+    replay = post_transaction(client, worker["id"], 25, "paie-1")
+    assert replay.status_code == 200
+    assert replay.json() == first.json()
+    assert replay.headers.get(server.IDEMPOTENT_REPLAY_HEADER) == "true"
+    assert run(db.transactions.count_documents({})) == 1
+    assert run(db.worker_balances.find_one({"_id": worker["id"]}))["due_cents"] == 2500
+
+    # Même clé, autre contenu : refusé
+    conflict = post_transaction(client, worker["id"], 30, "paie-1")
+    assert conflict.status_code == 422
+    assert run(db.transactions.count_documents({})) == 1
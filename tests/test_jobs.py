@@ -0,0 +1,88 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from mongomock_motor import AsyncMongoMockClient
+
+from jobs import DONE, RUNNING, JobQueue
+
+
+def make_queue(runs, release):
+    queue = JobQueue(concurrency=1, lease_seconds=60)
+
+    @queue.handler("purge")
+    async def purge(worker_id):
+        runs.append(worker_id)
+        await release.wait()
+        return {"worker_id": worker_id}
+
+    return queue
+
+
+async def wait_for_status(queue, job_id, status):
+    for _ in range(200):
+        job = await queue.get(job_id)
+        if job["status"] == status:
+            return job
+        await asyncio.sleep(0.005)
+    raise AssertionError(f"tâche {job_id} : {job['status']} au lieu de {status}")
+
+
+def test_live_sibling_jobs_are_not_taken_over(run):
+    async def scenario():
+        collection = AsyncMongoMockClient()["jobs_test"]["jobs"]
+        runs, release = [], asyncio.Event()
+        first, second = make_queue(runs, release), make_queue(runs, release)
+        await first.start(collection)
+        job = await first.submit("purge", worker_id="w1")
+        await wait_for_status(first, job["id"], RUNNING)
+
+        # Redémarrage d'un processus voisin : la tâche en cours n'est pas relancée
+        await second.start(collection)
+        assert await second.claim_expired() == 0
+        release.set()
+        await wait_for_status(first, job["id"], DONE)
+        await first.stop()
+        await second.stop()
+        return runs
+
+    assert run(scenario()) == ["w1"]
+
+
+def test_jobs_with_expired_lease_are_resumed(run):
+    async def scenario():
+        collection = AsyncMongoMockClient()["jobs_test"]["jobs"]
+        runs, release = [], asyncio.Event()
+        release.set()
+        # Tâche d'un processus mort : bail expiré
+        await collection.insert_one({
+            "id": "orphan", "type": "purge", "params": {"worker_id": "w2"}, "status": RUNNING,
+            "owner": "dead", "lease_until": datetime.utcnow() - timedelta(seconds=1),
+            "created_at": datetime.utcnow(), "started_at": None, "finished_at": None,
+            "result": None, "error": None,
+        })
+        queue = make_queue(runs, release)
+        await queue.start(collection)
+        job = await wait_for_status(queue, "orphan", DONE)
+        await queue.stop()
+        return runs, job
+
+    runs, job = run(scenario())
+    assert runs == ["w2"]
+    assert job["result"] == {"worker_id": "w2"}
+
+
+def test_submit_hides_lease_fields(run):
+    async def scenario():
+        collection = AsyncMongoMockClient()["jobs_test"]["jobs"]
+        release = asyncio.Event()
+        queue = make_queue([], release)
+        await queue.start(collection)
+        job = await queue.submit("purge", worker_id="w3")
+        stored = await queue.get(job["id"])
+        release.set()
+        await queue.stop()
+        return job, stored
+
+    job, stored = run(scenario())
+    assert "owner" not in job and "lease_until" not in job
+    assert set(job) == set(stored)
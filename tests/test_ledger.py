@@ -0,0 +1,74 @@
+import json
+
+import server
+
+
+def transaction(client, worker_id, kind, amount, **headers):
+    response = client.post(
+        "/api/transactions", json={"worker_id": worker_id, "type": kind, "amount": amount}, headers=headers
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def transaction_sums(db, run):
+    # Totaux recalculés depuis db.transactions, comparés au ledger
+    async def sums():
+        return {
+            row["_id"]: server.ledger_entry(row)
+            async for row in db.transactions.aggregate([server.totals_group_stage()])
+        }
+    return run(sums())
+
+
+def ledger(db, run):
+    async def entries():
+        return {entry["_id"]: server.ledger_entry(entry) async for entry in db.worker_balances.find()}
+    return {worker_id: entry for worker_id, entry in run(entries()).items() if entry["transaction_count"]}
+
+
+def test_ledger_matches_transactions_after_create_and_delete(client, db, run, worker):
+    transaction(client, worker["id"], "due", 100.10)
+    transaction(client, worker["id"], "due", 0.20)
+    paid = transaction(client, worker["id"], "paid", 50)
+    assert ledger(db, run) == transaction_sums(db, run)
+
+    assert client.delete(f"/api/transactions/{paid['id']}").status_code == 200
+    assert ledger(db, run) == transaction_sums(db, run)
+    balance = client.get(f"/api/workers/{worker['id']}/balance").json()
+    assert balance["balance"] == 100.30
+    assert balance["transaction_count"] == 2
+
+
+def test_ledger_matches_transactions_after_bulk_import(client, db, run, worker):
+    other = client.post("/api/workers", json={"name": "Bakary"}).json()
+    rows = [
+        {"worker_id": worker["id"], "type": "due", "amount": 12.34},
+        {"worker_id": other["id"], "type": "due", "amount": 7},
+        {"worker_id": "inconnu", "type": "due", "amount": 1},
+        {"worker_id": other["id"], "type": "paid", "amount": 2.5, "date": "2020-01-05T10:00:00Z"},
+    ]
+    response = client.post(
+        "/api/transactions/bulk",
+        content="\n".join(json.dumps(row) for row in rows),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    result = response.json()
+    assert (result["inserted"], result["error_count"]) == (3, 1)
+    assert ledger(db, run) == transaction_sums(db, run)
+    assert run(server.reconcile_ledger(dry_run=True)) == []
+
+
+def test_reconcile_detects_and_fixes_drift(client, db, run, worker):
+    transaction(client, worker["id"], "due", 40)
+    run(db.worker_balances.update_one({"_id": worker["id"]}, {"$inc": {"due_cents": 300}}))
+
+    drifts = run(server.reconcile_ledger(dry_run=True))
+    assert [(drift["worker_id"], drift["ledger"]["due_cents"], drift["expected"]["due_cents"]) for drift in drifts] \
+        == [(worker["id"], 4300, 4000)]
+    # dry_run ne corrige rien
+    assert run(server.reconcile_ledger(dry_run=True)) == drifts
+
+    assert run(server.reconcile_ledger()) == drifts
+    assert run(server.reconcile_ledger(dry_run=True)) == []
+    assert ledger(db, run) == transaction_sums(db, run)
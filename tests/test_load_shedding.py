@@ -0,0 +1,76 @@
+import asyncio
+
+import httpx
+import pytest
+
+import server
+
+
+@pytest.fixture
+def limiter(db, monkeypatch):
+    # Une seule requête admise à la fois
+    monkeypatch.setattr(server.request_limiter, "max_in_flight", 1)
+    monkeypatch.setattr(server.request_limiter, "wait_timeout", 0.05)
+    return server.request_limiter
+
+
+def api():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test")
+
+
+def test_request_is_shed_when_no_slot_and_queue_full(limiter, monkeypatch, run):
+    monkeypatch.setattr(limiter, "max_waiting", 0)
+
+    async def scenario():
+        async with api() as http:
+            assert await limiter.acquire()
+            try:
+                shed = await http.get("/api/workers")
+                health = await http.get("/api/health")
+            finally:
+                limiter.release()
+            admitted = await http.get("/api/workers")
+        return shed, health, admitted
+
+    shed, health, admitted = run(scenario())
+    assert shed.status_code == 503
+    assert shed.headers["retry-after"] == str(server.RETRY_AFTER_SECONDS)
+    assert health.status_code == 200  # exclu du délestage
+    assert health.json()["load_shedding"]["in_flight"] == 1
+    assert admitted.status_code == 200
+
+
+def test_queued_request_runs_when_a_slot_frees(limiter, monkeypatch, run):
+    monkeypatch.setattr(limiter, "max_waiting", 1)
+    monkeypatch.setattr(limiter, "wait_timeout", 5)
+
+    async def scenario():
+        async with api() as http:
+            assert await limiter.acquire()
+            queued = asyncio.create_task(http.get("/api/workers"))
+            while limiter.waiting == 0:
+                await asyncio.sleep(0.001)
+            # File pleine : la requête suivante est refusée sans attendre
+            shed = await http.get("/api/workers")
+            limiter.release()
+            return await queued, shed
+
+    queued, shed = run(scenario())
+    assert queued.status_code == 200
+    assert shed.status_code == 503
+    assert limiter.in_flight == 0
+
+
+def test_queued_request_is_shed_after_wait_timeout(limiter, monkeypatch, run):
+    monkeypatch.setattr(limiter, "max_waiting", 10)
+
+    async def scenario():
+        async with api() as http:
+            assert await limiter.acquire()
+            try:
+                return await http.get("/api/workers")
+            finally:
+                limiter.release()
+
+    assert run(scenario()).status_code == 503
+    assert limiter.waiting == 0
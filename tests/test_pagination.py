@@ -0,0 +1,48 @@
+from datetime import datetime
+
+import server
+
+
+def collect_pages(client, path, limit):
+    items, pages, cursor = [], 0, None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get(path, params=params)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        assert len(page) <= limit
+        items.extend(page)
+        pages += 1
+        cursor = response.headers.get(server.NEXT_CURSOR_HEADER)
+        if not cursor:
+            return items, pages
+
+
+def test_worker_pages_have_no_gaps_or_duplicates(client, db, run):
+    # Plusieurs ouvriers créés au même instant : l'id départage le tri
+    created_at = datetime(2024, 3, 1)
+    run(db.workers.insert_many([
+        {"id": f"w-{i:02d}", "name": f"Ouvrier {i}", "position": None, "phone": None,
+         "created_at": created_at if i % 3 else datetime(2024, 3, 1, 0, 0, i)}
+        for i in range(23)
+    ]))
+
+    items, pages = collect_pages(client, "/api/workers", limit=5)
+    ids = [worker["id"] for worker in items]
+    assert pages == 5
+    assert len(ids) == len(set(ids)) == 23
+    assert ids == [worker["id"] for worker in client.get("/api/workers", params={"limit": 100}).json()]
+
+
+def test_transaction_pages_follow_date_order(client, worker):
+    for amount in range(1, 12):
+        client.post("/api/transactions", json={"worker_id": worker["id"], "type": "due", "amount": amount})
+
+    items, _ = collect_pages(client, f"/api/workers/{worker['id']}/transactions", limit=4)
+    assert sorted(transaction["amount"] for transaction in items) == list(range(1, 12))
+    keys = [(transaction["date"], transaction["id"]) for transaction in items]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_invalid_cursor_is_rejected(client):
+    assert client.get("/api/workers", params={"cursor": "pas-un-curseur"}).status_code == 400
@@ -0,0 +1,72 @@
+import asyncio
+import os
+import random
+
+import httpx
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import server
+
+# Écritures transactionnelles (MONGO_TRANSACTIONS=on) : replica set requis,
+# voir docker-compose.replica-set.yml
+TEST_REPLICA_SET_URL = os.environ.get("TEST_REPLICA_SET_URL")
+
+pytestmark = pytest.mark.skipif(
+    not TEST_REPLICA_SET_URL, reason="TEST_REPLICA_SET_URL non défini (replica set MongoDB requis)"
+)
+
+
+@pytest.fixture
+def replica_set(monkeypatch):
+    monkeypatch.setattr(server, "MONGO_TRANSACTIONS", "on")
+    monkeypatch.setattr(server, "transactions_supported", None)
+    monkeypatch.setattr(server, "balance_cache", server.BalanceCache(ttl=60, max_entries=1000))
+    monkeypatch.setattr(server, "report_cache", server.BalanceCache(ttl=60, max_entries=1000))
+
+    def connect():
+        # Client créé dans la boucle du test : un client Motor ne change pas de boucle
+        db_client = AsyncIOMotorClient(TEST_REPLICA_SET_URL)
+        monkeypatch.setattr(server, "client", db_client)
+        monkeypatch.setattr(server, "db", db_client["payroll_replica_set_test"])
+        return db_client
+
+    return connect
+
+
+def test_concurrent_creates_and_deletes_leave_no_orphans(replica_set, run):
+    async def scenario():
+        db_client = replica_set()
+        await db_client.drop_database("payroll_replica_set_test")
+        await server.bootstrap_db()
+        await server.job_queue.start(server.db.jobs)
+        try:
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                worker_ids = [
+                    (await http.post("/api/workers", json={"name": f"Ouvrier {i}"})).json()["id"]
+                    for i in range(20)
+                ]
+                operations = [
+                    http.post("/api/transactions", json={"worker_id": worker_ids[i % 20], "type": "due", "amount": 1})
+                    for i in range(400)
+                ] + [http.delete(f"/api/workers/{worker_id}") for worker_id in worker_ids[::2]]
+                random.Random(0).shuffle(operations)
+                statuses = {response.status_code for response in await asyncio.gather(*operations)}
+            await server.job_queue.join()
+
+            active = [worker["id"] async for worker in server.db.workers.find(server.ACTIVE_WORKERS, {"id": 1})]
+            orphans = await server.db.transactions.count_documents({"worker_id": {"$nin": active}})
+            orphans += await server.db.worker_balances.count_documents({"_id": {"$nin": active}})
+            drifts = await server.reconcile_ledger(dry_run=True)
+            return statuses, orphans, drifts
+        finally:
+            await server.job_queue.stop()
+            await db_client.drop_database("payroll_replica_set_test")
+            db_client.close()
+
+    statuses, orphans, drifts = run(scenario())
+    # 404 levée dans le callback de with_transaction : transaction annulée, rien d'écrit
+    assert statuses <= {200, 202, 404}
+    assert orphans == 0
+    assert drifts == []
@@ -0,0 +1,68 @@
+import json
+
+import server
+
+
+def import_rows(client, *rows):
+    content = "\n".join(
+        json.dumps({"worker_id": worker_id, "type": kind, "amount": amount, "date": date})
+        for worker_id, kind, amount, date in rows
+    )
+    response = client.post("/api/transactions/bulk", content=content, headers={"Content-Type": "application/x-ndjson"})
+    assert response.json()["inserted"] == len(rows), response.text
+
+
+def report(client, **params):
+    response = client.get("/api/reports/totals", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_totals_by_worker_and_by_position(client):
+    masons = [client.post("/api/workers", json={"name": name, "position": "Maçon"}).json()["id"] for name in "AB"]
+    other = client.post("/api/workers", json={"name": "D"}).json()["id"]
+    import_rows(
+        client,
+        (masons[0], "due", 100, "2024-01-10T08:00:00"),
+        (masons[0], "paid", 40, "2024-01-25T08:00:00"),
+        (masons[1], "due", 30, "2024-01-12T08:00:00"),
+        (other, "due", 5, "2024-02-03T08:00:00"),
+    )
+
+    # Lignes triées par (période, ouvrier)
+    by_worker = report(client, to="2024-03-01T00:00:00")
+    assert [(row["period"], row["worker_id"], row["balance"], row["transaction_count"]) for row in by_worker] == sorted([
+        ("2024-01-01T00:00:00", masons[0], 60, 2),
+        ("2024-01-01T00:00:00", masons[1], 30, 1),
+        ("2024-02-01T00:00:00", other, 5, 1),
+    ])
+
+    by_position = report(client, group_by="position", to="2024-03-01T00:00:00")
+    assert [(row["period"], row["position"], row["total_due"], row["total_paid"]) for row in by_position] == [
+        ("2024-01-01T00:00:00", "Maçon", 130, 40),
+        ("2024-02-01T00:00:00", None, 5, 0),
+    ]
+
+    # Semaines commençant le lundi ; intervalle [from, to)
+    weekly = report(client, period="week", worker_id=masons[0], **{"from": "2024-01-15T00:00:00Z"})
+    assert [(row["period"], row["total_paid"]) for row in weekly] == [("2024-01-22T00:00:00", 40)]
+
+
+def test_closed_periods_are_cached_until_a_back_dated_write(client, worker):
+    import_rows(client, (worker["id"], "due", 10, "2024-01-10T08:00:00"))
+    assert report(client)[0]["total_due"] == 10
+    hits = server.report_cache.stats()["hits"]
+
+    # Écriture dans la période en cours : partie close toujours servie par le cache
+    client.post("/api/transactions", json={"worker_id": worker["id"], "type": "due", "amount": 1})
+    assert len(report(client)) == 2
+    assert server.report_cache.stats()["hits"] == hits + 1
+
+    # Import daté d'une période close : cache invalidé
+    import_rows(client, (worker["id"], "due", 5, "2024-01-11T08:00:00"))
+    assert report(client)[0]["total_due"] == 15
+    assert server.report_cache.stats()["hits"] == hits + 1
+
+
+def test_unknown_period_is_rejected(client):
+    assert client.get("/api/reports/totals", params={"period": "year"}).status_code == 422
@@ -0,0 +1,53 @@
+from datetime import datetime
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def workers(client):
+    people = [
+        ("Élodie Martin", "Électricienne", "06 12 34 56 78"),
+        ("Eloi Durand", "Maçon", None),
+        ("Marc Élan", "Maçon", None),
+        ("Ali", "Plombier", "0700000000"),
+        ("Alice", None, None),
+    ]
+    return {
+        name: client.post("/api/workers", json={"name": name, "position": position, "phone": phone}).json()["id"]
+        for name, position, phone in people
+    }
+
+
+def search(client, q, **params):
+    response = client.get("/api/workers/search", params={"q": q, **params})
+    assert response.status_code == 200, response.text
+    return [worker["name"] for worker in response.json()], response.headers.get(server.NEXT_CURSOR_HEADER)
+
+
+def test_prefix_search_ignores_accents_and_case(client, workers):
+    assert search(client, "elo")[0] == ["Élodie Martin", "Eloi Durand"]
+    assert search(client, "elodie mar")[0] == ["Élodie Martin"]
+    assert set(search(client, "MAÇON")[0]) == {"Eloi Durand", "Marc Élan"}
+    assert search(client, "0612")[0] == ["Élodie Martin"]
+    # Préfixe du nom d'abord, puis des autres termes
+    assert search(client, "ali")[0] == ["Ali", "Alice"]
+
+
+def test_search_pages_cross_tiers_without_duplicates(client, workers):
+    names, cursor = search(client, "e", limit=1)
+    while cursor:
+        page, cursor = search(client, "e", limit=1, cursor=cursor)
+        names += page
+    assert names == search(client, "e")[0]
+    assert len(names) == len(set(names))
+    assert client.get("/api/workers/search", params={"q": "e", "cursor": "zzz"}).status_code == 400
+
+
+def test_search_hides_deleted_workers_and_internal_fields(client, db, run, workers):
+    run(db.workers.update_one({"id": workers["Ali"]}, {"$set": {"deleted_at": datetime.utcnow()}}))
+    response = client.get("/api/workers/search", params={"q": "ali"})
+    assert [worker["name"] for worker in response.json()] == ["Alice"]
+    assert "search_name" not in response.json()[0]
+    assert "search_terms" not in response.json()[0]
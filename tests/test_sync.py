@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+
+
+@pytest.fixture(autouse=True)
+def no_overlap(monkeypatch):
+    # Pas de relecture des dernières secondes : réponses exactes
+    monkeypatch.setattr(server, "SYNC_OVERLAP_SECONDS", 0)
+
+
+def sync(client, token=None, **params):
+    response = client.get("/api/sync", params={**({"since": token} if token else {}), **params})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_full_sync_pages_then_returns_only_new_items(client, db, run, worker):
+    # Ouvrier antérieur à sync_at, daté par "manage.py backfill-sync"
+    run(db.workers.insert_one({"id": "legacy", "name": "Moussa", "position": None, "phone": None,
+                               "created_at": datetime(2020, 1, 1), "deleted_at": None}))
+    assert run(server.backfill_sync()) == 1
+    transaction = client.post("/api/transactions", json={"worker_id": worker["id"], "type": "due", "amount": 10}).json()
+
+    first = sync(client, limit=2)
+    assert [w["id"] for w in first["workers"]] == ["legacy", worker["id"]]
+    assert first["has_more"]
+    second = sync(client, first["token"], limit=2)
+    assert [t["id"] for t in second["transactions"]] == [transaction["id"]]
+    assert second["balances"] == [{"worker_id": worker["id"], "total_due": 10, "total_paid": 0,
+                                   "balance": 10, "transaction_count": 1}]
+    assert not second["has_more"]
+
+    # Le jeton relit l'instant du dernier élément : celui-ci peut revenir, sans effet
+    seen = {transaction["id"]}
+    assert {t["id"] for t in sync(client, second["token"])["transactions"]} <= seen
+    paid = client.post("/api/transactions", json={"worker_id": worker["id"], "type": "paid", "amount": 4}).json()
+    delta = sync(client, second["token"])
+    assert {t["id"] for t in delta["transactions"]} - seen == {paid["id"]}
+    assert delta["workers"] == []
+    assert delta["balances"][0]["balance"] == 6
+
+
+def test_deletions_arrive_as_tombstones(client, worker):
+    transaction = client.post("/api/transactions", json={"worker_id": worker["id"], "type": "due", "amount": 10}).json()
+    token = sync(client)["token"]
+    assert client.delete(f"/api/transactions/{transaction['id']}").status_code == 200
+
+    delta = sync(client, token)
+    assert delta["deleted"] == [{"type": "transaction", "id": transaction["id"], "worker_id": worker["id"]}]
+    assert delta["balances"][0]["transaction_count"] == 0
+
+
+def test_unchanged_sync_is_not_modified(client, worker):
+    token = sync(client)["token"]
+    response = client.get("/api/sync", params={"since": token})
+    again = client.get("/api/sync", params={"since": token}, headers={"If-None-Match": response.headers["etag"]})
+    assert again.status_code == 304
+
+
+def test_token_older_than_pruned_tombstones_is_gone(client, db, run, worker):
+    token = sync(client)["token"]
+    transaction = client.post("/api/transactions", json={"worker_id": worker["id"], "type": "due", "amount": 1}).json()
+    client.delete(f"/api/transactions/{transaction['id']}")
+    expired = datetime.utcnow() - timedelta(days=server.SYNC_TOMBSTONE_DAYS + 1)
+    run(db.sync_tombstones.update_many({}, {"$set": {"sync_at": expired}}))
+    # Suppression suivante : les tombes expirées sont retirées
+    transaction = client.post("/api/transactions", json={"worker_id": worker["id"], "type": "due", "amount": 1}).json()
+    client.delete(f"/api/transactions/{transaction['id']}")
+
+    old_token = server.encode_sync_token(expired - timedelta(days=1), "", False)
+    assert client.get("/api/sync", params={"since": old_token}).status_code == 410
+    assert client.get("/api/sync", params={"since": token}).status_code == 200
+    assert client.get("/api/sync", params={"since": "pas-un-jeton"}).status_code == 400